@@ -0,0 +1,180 @@
+"""
+v.1.0.0 - Basic release
+Batched input files: several candidate designs are written as disjoint copies of the same model
+so that a single CalculiX run solves all of them.
+"""
+
+from file_manager import FileProcessor
+
+
+class BatchDeckWriter:
+    """Writes K copies of the model with offset IDs and renamed sets in a single input file"""
+
+    # Cards written only once for all copies
+    shared_cards = ("*HEADING", "*MATERIAL", "*ELASTIC", "*DENSITY", "*EXPANSION",
+                    "*CONDUCTIVITY", "*SPECIFIC HEAT", "*AMPLITUDE", "*PHYSICAL CONSTANTS",
+                    "*STEP", "*STATIC", "*NODE FILE", "*EL FILE", "*NODE OUTPUT",
+                    "*ELEMENT OUTPUT", "*OUTPUT", "*END STEP")
+    # Cards of the model definition, the whole card is repeated for each copy
+    model_cards = ("*NODE", "*ELEMENT", "*NSET", "*ELSET", "*ORIENTATION", "*SHELL SECTION",
+                   "*SOLID SECTION")
+    # Boundary conditions and loads, the data lines are repeated for each copy
+    load_cards = ("*BOUNDARY", "*CLOAD", "*DLOAD")
+    # Card parameters that refer to names of the repeated cards
+    renamed_parameters = ("NSET", "ELSET", "ORIENTATION", "NAME")
+
+    def __init__(self, processor: FileProcessor) -> None:
+        """
+        Splits the deck in cards and finds the ID offsets of the copies
+
+        Args:
+            processor (FileProcessor): processor that holds the deck and the output file name
+        """
+        self.processor = processor
+        self.cards = []
+
+        read_lines = processor.read_lines
+        for index in range(len(read_lines)):
+            line = read_lines[index]
+            if line.startswith("**") or not line.strip():
+                continue
+
+            if line.startswith("*"):
+                keyword = line.split(",")[0].strip().upper()
+                if keyword not in self.shared_cards + self.model_cards + self.load_cards:
+                    raise ValueError(f"{keyword} card is not supported in batched mode")
+                self.cards.append((keyword, line, []))
+            elif self.cards:
+                self.cards[-1][2].append(line)
+
+        # The IDs of each copy start after the highest ID of the model
+        self.node_offset = max(self._card_ids("*NODE"), default=0)
+        self.element_offset = max(self._card_ids("*ELEMENT"), default=0)
+
+    def _card_ids(self, keyword: str):
+        """IDs of the first field of the data lines of all cards with the keyword"""
+        for card_keyword, _, data_lines in self.cards:
+            if card_keyword != keyword:
+                continue
+            continuation = False
+            for line in data_lines:
+                if not continuation:
+                    yield int(line.split(",")[0])
+                continuation = line.rstrip().endswith(",")
+
+    def copy_name(self, name: str, copy: int) -> str:
+        """
+        Name of a set or orientation in the given copy, the first copy keeps the original names
+
+        Args:
+            name (str): name in the original deck
+            copy (int): index of the copy
+        """
+        return name if copy == 0 else f"{name.strip()}_C{copy}"
+
+    def _card_line(self, line: str, copy: int) -> str:
+        """Renames the set and orientation parameters of a card line"""
+        parts = line.rstrip("\r\n").split(",")
+        for i in range(1, len(parts)):
+            if "=" in parts[i]:
+                key, value = parts[i].split("=", 1)
+                if key.strip().upper() in self.renamed_parameters:
+                    parts[i] = f"{key}={self.copy_name(value.strip(), copy)}"
+        return ",".join(parts) + "\n"
+
+    def _shift(self, field: str, offset: int, copy: int) -> str:
+        """Offsets a numeric ID or renames a set name"""
+        field = field.strip()
+        if not field:
+            return field
+        if field.lstrip("-").isdigit():
+            return str(int(field) + offset)
+        return self.copy_name(field, copy)
+
+    def _data_lines(self, keyword: str, card_line: str, data_lines: list, copy: int) -> list:
+        """Data lines of a card with offset IDs and renamed sets"""
+        node_offset = self.node_offset * copy
+        element_offset = self.element_offset * copy
+        generate = "GENERATE" in card_line.upper()
+
+        new_lines = []
+        continuation = False
+        for line in data_lines:
+            fields = line.rstrip("\r\n").split(",")
+
+            if keyword == "*NODE":
+                fields[0] = self._shift(fields[0], node_offset, copy)
+
+            elif keyword == "*ELEMENT":
+                start = 0
+                if not continuation:
+                    fields[0] = self._shift(fields[0], element_offset, copy)
+                    start = 1
+                fields[start:] = [self._shift(field, node_offset, copy)
+                                  for field in fields[start:]]
+                continuation = line.rstrip().endswith(",")
+
+            elif keyword in ("*NSET", "*ELSET"):
+                offset = node_offset if keyword == "*NSET" else element_offset
+                if generate:
+                    fields[:2] = [self._shift(field, offset, copy) for field in fields[:2]]
+                else:
+                    fields = [self._shift(field, offset, copy) for field in fields]
+
+            elif keyword == "*SHELL SECTION" and len(fields) >= 4:
+                # Orientation of each layer of composite sections
+                fields[3] = self._shift(fields[3], 0, copy)
+
+            elif keyword in ("*BOUNDARY", "*CLOAD"):
+                fields[0] = self._shift(fields[0], node_offset, copy)
+
+            elif keyword == "*DLOAD":
+                fields[0] = self._shift(fields[0], element_offset, copy)
+
+            new_lines.append(",".join(fields) + "\n")
+
+        return new_lines
+
+    def write_input_file(self, angle_sets: list, requests: list) -> None:
+        """
+        Writes the batched input file with one copy of the model for each angle set.
+
+        Args:
+            angle_sets (list): angles of rotation for each *ORIENTATION card, for each copy
+            requests (list): (optimization type, set) of each output request, requested for all
+                the copies
+        """
+        num_orientations = len(self.processor.orientation_line)
+        for angles in angle_sets:
+            if len(angles) != num_orientations:
+                raise ValueError(
+                    f"Input angles ({len(angles)}) differ from orientations ({num_orientations})")
+
+        with open(self.processor.output_file + ".inp", 'w', encoding="utf-8") as file:
+            orientation_count = 0
+
+            for keyword, card_line, data_lines in self.cards:
+
+                if keyword in self.model_cards:
+                    for copy, angles in enumerate(angle_sets):
+                        file.write(self._card_line(card_line, copy))
+                        file.writelines(self._data_lines(keyword, card_line, data_lines, copy))
+                        if keyword == "*ORIENTATION":
+                            file.write(f"3, {angles[orientation_count]:.4f}\n")
+                    if keyword == "*ORIENTATION":
+                        orientation_count += 1
+
+                elif keyword in self.load_cards:
+                    file.write(card_line)
+                    for copy in range(len(angle_sets)):
+                        file.writelines(self._data_lines(keyword, card_line, data_lines, copy))
+
+                else:
+                    # Output requests just above the end of each step
+                    if keyword == "*END STEP":
+                        for copy in range(len(angle_sets)):
+                            for optimization_type, optimization_set in requests:
+                                file.write(self.processor.output_request(
+                                    optimization_type, self.copy_name(optimization_set, copy)))
+                    file.write(card_line)
+                    file.writelines(data_lines)
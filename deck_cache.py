@@ -0,0 +1,151 @@
+"""
+v.1.0.0 - Basic release
+Sidecar cache of the parsed metadata of CalculiX input files, so unchanged decks are not
+re-scanned each time they are opened.
+"""
+
+import os
+import hashlib
+import tempfile
+import zipfile
+import numpy as np
+
+
+class DeckCache:
+    """Reads and writes the *.npz metadata cache stored next to the input file"""
+
+    cache_version = 1
+    block_size = 1 << 22
+
+    def __init__(self, file_path: str) -> None:
+        """
+        Initialization of local class variables
+
+        Args:
+            file_path (str): path of the input file
+        """
+        self.file_path = os.path.abspath(file_path)
+        self.cache_path = self.file_path + ".optcomp.npz"
+
+    def _file_key(self) -> tuple:
+        """Size and modification time of the input file"""
+        stat = os.stat(self.file_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def hash_file(self) -> str:
+        """
+        Reads the input file in binary blocks to calculate only its content hash, used to
+        validate the cache without finding the line offsets.
+
+        Returns:
+            content_hash (str): BLAKE2 hash of the file
+        """
+        content_hash = hashlib.blake2b(digest_size=16)
+        with open(self.file_path, 'rb') as file:
+            for block in iter(lambda: file.read(self.block_size), b""):
+                content_hash.update(block)
+        return content_hash.hexdigest()
+
+    def scan_file(self) -> tuple:
+        """
+        Reads the input file in binary blocks to calculate its content hash and the offset of
+        the start of each line.
+
+        Returns:
+            content_hash (str): BLAKE2 hash of the file
+            line_offsets (np.ndarray): start offset of each line plus the file size at the end
+        """
+        content_hash = hashlib.blake2b(digest_size=16)
+        offsets = [np.zeros(1, dtype=np.int64)]
+        position = 0
+
+        with open(self.file_path, 'rb') as file:
+            while True:
+                block = file.read(self.block_size)
+                if not block:
+                    break
+                content_hash.update(block)
+                newlines = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == 10)
+                offsets.append(newlines.astype(np.int64) + position + 1)
+                position += len(block)
+
+        line_offsets = np.concatenate(offsets)
+        if line_offsets[-1] != position:
+            line_offsets = np.append(line_offsets, position)
+
+        return content_hash.hexdigest(), line_offsets
+
+    def load(self, required_keys: tuple = ()) -> dict:
+        """
+        Loads the cached metadata if the input file did not change since it was saved.
+
+        Args:
+            required_keys (tuple): metadata keys that must be in the cache, caches written by
+                other versions without them are not valid
+
+        Returns:
+            metadata (dict): cached arrays, None if there is no valid cache
+        """
+        if not os.path.isfile(self.cache_path):
+            return None
+
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as cache:
+                metadata = {key: cache[key] for key in cache.files}
+            if not set(required_keys).union(["line_offsets"]).issubset(metadata):
+                return None
+
+            size, mtime = self._file_key()
+            if (int(metadata["cache_version"]) != self.cache_version
+                    or int(metadata["file_size"]) != size
+                    or int(metadata["file_mtime"]) != mtime):
+                return None
+
+            if str(metadata["content_hash"]) != self.hash_file():
+                return None
+
+        # Unreadable or incomplete caches are scanned again
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            return None
+
+        return metadata
+
+    def save(self, metadata: dict) -> np.ndarray:
+        """
+        Saves the metadata together with the key of the input file. Lists of strings are stored
+        as unicode arrays, so the cache is loaded without pickle. The cache is written to a
+        temporary file that replaces the old one at the end, so interrupted or concurrent saves
+        never leave a partial cache.
+
+        Args:
+            metadata (dict): arrays or lists to be cached
+
+        Returns:
+            line_offsets (np.ndarray): start offset of each line plus the file size at the end
+        """
+        size, mtime = self._file_key()
+        content_hash, line_offsets = self.scan_file()
+
+        arrays = {key: np.asarray(value) for key, value in metadata.items()}
+        arrays.update({
+            "cache_version": np.asarray(self.cache_version),
+            "file_size": np.asarray(size),
+            "file_mtime": np.asarray(mtime),
+            "content_hash": np.asarray(content_hash),
+            "line_offsets": line_offsets
+        })
+
+        temp_path = None
+        try:
+            with tempfile.NamedTemporaryFile(
+                    'wb', dir=os.path.dirname(self.cache_path), suffix=".tmp",
+                    delete=False) as file:
+                temp_path = file.name
+                np.savez(file, **arrays)
+            os.replace(temp_path, self.cache_path)
+        except OSError:
+            print("The metadata cache could not be saved, the deck will be scanned next time.")
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        return line_offsets
@@ -7,7 +7,130 @@ process *.dat files output requests and run CalculiX by CMD.
 import subprocess
 import re
 import os
+import mmap
+import itertools
 import numpy as np
+from deck_cache import DeckCache
+
+# Columns of the *.dat data lines used by each optimization type
+RESULT_COLUMNS = {
+    "Stress": (2, 3, 5),
+    "Strain": (2, 3, 5),
+    "Displacement": (1, 2, 3)
+}
+
+# Keys of the deck metadata stored in the sidecar cache
+DECK_METADATA_KEYS = (
+    "orientations_list", "orientations_index", "materials_list", "steps_list", "nsets_list",
+    "elsets_list", "solid_section_list", "solid_section_index", "shell_list", "shell_index",
+    "composite_list", "composite_index", "composite_layers", "orientation_line",
+    "orientation_names", "x_local", "y_local", "z_local", "angle_x", "angle_y", "angle_z"
+)
+
+
+class CalculixError(RuntimeError):
+    """
+    Raised when a CalculiX run fails or its results file is missing or truncated. Transient
+    errors may not happen again in a new run of the same design, while the others (e.g. no
+    convergence) always do.
+    """
+
+    def __init__(self, message: str, transient: bool = True) -> None:
+        super().__init__(message)
+        self.transient = transient
+
+
+class MappedDeck:
+    """
+    Read-only sequence of the lines of an input file, backed by a memory map of the file and an
+    array with the offset of each line. Lines are decoded only when accessed and the mapped
+    pages are shared by all processes that open the same file.
+    """
+
+    def __init__(self, file_path: str, line_offsets: np.ndarray = None) -> None:
+        """
+        Maps the file and finds the start of each line if the offsets are not given
+
+        Args:
+            file_path (str): path of the input file
+            line_offsets (np.ndarray): start offset of each line plus the file size at the end,
+                as stored by the deck cache
+        """
+        self.file_path = file_path
+        self.buffer = b""
+
+        with open(file_path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size > 0:
+                self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if line_offsets is None:
+            newlines = np.flatnonzero(np.frombuffer(self.buffer, dtype=np.uint8) == 10)
+            line_offsets = np.concatenate(([0], newlines + 1)).astype(np.int64)
+            if line_offsets[-1] != len(self.buffer):
+                line_offsets = np.append(line_offsets, len(self.buffer))
+        self.line_offsets = np.asarray(line_offsets, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.line_offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("deck line index out of range")
+
+        return self.text(index, index + 1)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Releases the memory map, so the input file can be replaced or deleted (Windows does not
+        allow it while the file is mapped). The deck can not be read after it is closed.
+        """
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self.buffer = b""
+        self.line_offsets = np.zeros(1, dtype=np.int64)
+
+    def __getstate__(self) -> dict:
+        return {"file_path": self.file_path, "line_offsets": self.line_offsets}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["file_path"], state["line_offsets"])
+
+    def text(self, start: int, end: int) -> str:
+        """
+        Decodes a range of lines at once, with the same line endings given by readlines()
+
+        Args:
+            start (int): index of the first line
+            end (int): index after the last line
+        """
+        end = min(end, len(self))
+        if start >= end:
+            return ""
+        raw = self.buffer[self.line_offsets[start]:self.line_offsets[end]]
+        return raw.decode("utf-8").replace("\r\n", "\n")
+
+    def card_indices(self) -> np.ndarray:
+        """
+        Indexes of the lines that start with "*", which are the keyword and comment lines.
+        """
+        line_indices = np.flatnonzero(self.line_offsets[:-1] < self.line_offsets[1:])
+        first_bytes = np.frombuffer(self.buffer, dtype=np.uint8)[self.line_offsets[line_indices]]
+        return line_indices[first_bytes == ord("*")]
 
 
 class FileProcessor:
@@ -20,7 +143,6 @@ class FileProcessor:
         self.read_lines = None
         self.output_file = "MOD_file"
         self.orientation_line = []
-        self.modified_lines = []
         self.sxx_values = []
         self.syy_values = []
         self.sxy_values = []
@@ -30,6 +152,10 @@ class FileProcessor:
         self.uxx_values = []
         self.uyy_values = []
         self.uzz_values = []
+        self.step_sizes = []
+        self.result_ids = None
+        self.element_region = None
+        self.chunk_size = 65536
 
         self.orientations_list = []
         self.orientations_index = []
@@ -45,21 +171,130 @@ class FileProcessor:
         self.composite_index = []
         self.shell_list = []
         self.shell_index = []
+        self.orientation_data = None
 
-    def read_file(self, file_path: str) -> None:
+    def read_file(self, file_path: str, memory_map: bool = False,
+                  line_offsets: np.ndarray = None) -> None:
         """
         Opens the specified file and stores its data in a string
         
         Args:
             file_path (str): path of the specified input file
+            memory_map (bool): if True, the lines are stored as a MappedDeck instead of a list
+            line_offsets (np.ndarray): known line offsets of the file, used with memory_map
         """
+        self.close_deck()
         try:
-            with open(file_path, 'r', encoding="utf-8") as file:
-                self.read_lines = file.readlines()
+            if memory_map:
+                self.read_lines = MappedDeck(file_path, line_offsets)
+            else:
+                with open(file_path, 'r', encoding="utf-8") as file:
+                    self.read_lines = file.readlines()
 
         except FileNotFoundError:
             print("Sorry, the file path cannot be found or is invalid.")
 
+    def close_deck(self) -> None:
+        """
+        Releases the memory map of the input file, if it was opened with memory_map
+        """
+        if isinstance(self.read_lines, MappedDeck):
+            self.read_lines.close()
+        self.read_lines = None
+
+    def open_deck(self, file_path: str, use_cache: bool = True, memory_map: bool = False) -> None:
+        """
+        Reads the input file and its metadata (search_information, count_composite_layers and
+        search_orientation results). The metadata is loaded from the sidecar cache when the file
+        did not change, otherwise the file is scanned and the cache is updated.
+
+        Args:
+            file_path (str): path of the specified input file
+            use_cache (bool): False to always scan the file
+            memory_map (bool): if True, the lines are stored as a MappedDeck
+        """
+        cache = DeckCache(file_path)
+        metadata = cache.load(DECK_METADATA_KEYS) if use_cache else None
+        line_offsets = metadata["line_offsets"] if metadata is not None else None
+
+        self.read_file(file_path, memory_map, line_offsets)
+        if self.read_lines is None:
+            raise TypeError(f"The file {file_path} could not be read")
+
+        if metadata is not None:
+            self.restore_metadata(metadata)
+            return
+
+        self.search_information()
+        self.count_composite_layers(self.composite_index)
+        self.orientation_data = self.search_orientation()
+
+        if use_cache:
+            cache.save(self.deck_metadata())
+
+    def deck_metadata(self) -> dict:
+        """
+        Gathers the metadata found in the input file.
+
+        Returns:
+            metadata (dict): lists and arrays of the information of the deck
+        """
+        (orientation_names, x_local, y_local, z_local,
+         angle_x, angle_y, angle_z) = self.orientation_data
+
+        return {
+            "orientations_list": np.array(self.orientations_list, dtype=str),
+            "orientations_index": np.array(self.orientations_index, dtype=np.int64),
+            "materials_list": np.array(self.materials_list, dtype=str),
+            "steps_list": np.array(self.steps_list, dtype=str),
+            "nsets_list": np.array(self.nsets_list, dtype=str),
+            "elsets_list": np.array(self.elsets_list, dtype=str),
+            "solid_section_list": np.array(self.solid_section_list, dtype=str),
+            "solid_section_index": np.array(self.solid_section_index, dtype=np.int64),
+            "shell_list": np.array(self.shell_list, dtype=str),
+            "shell_index": np.array(self.shell_index, dtype=np.int64),
+            "composite_list": np.array(self.composite_list, dtype=str),
+            "composite_index": np.array(self.composite_index, dtype=np.int64),
+            "composite_layers": np.array(self.composite_layers, dtype=np.int64),
+            "orientation_line": np.array(self.orientation_line, dtype=np.int64),
+            "orientation_names": np.array(orientation_names, dtype=str),
+            "x_local": x_local,
+            "y_local": y_local,
+            "z_local": z_local,
+            "angle_x": angle_x,
+            "angle_y": angle_y,
+            "angle_z": angle_z
+        }
+
+    def restore_metadata(self, metadata: dict) -> None:
+        """
+        Stores the cached metadata inside the class as if the input file had been scanned.
+
+        Args:
+            metadata (dict): arrays loaded from the cache
+        """
+        for name in ("orientations_list", "materials_list", "steps_list", "nsets_list",
+                     "elsets_list", "solid_section_list", "shell_list", "composite_list"):
+            setattr(self, name, [str(value) for value in metadata[name]])
+
+        for name in ("orientations_index", "solid_section_index", "shell_index",
+                     "composite_index", "composite_layers", "orientation_line"):
+            setattr(self, name, [int(value) for value in metadata[name]])
+
+        self.orientation_data = (
+            [str(name) for name in metadata["orientation_names"]],
+            metadata["x_local"], metadata["y_local"], metadata["z_local"],
+            metadata["angle_x"], metadata["angle_y"], metadata["angle_z"])
+
+    def _card_lines(self):
+        """
+        Indexes of the lines that may hold a card. A MappedDeck finds them directly in the mapped
+        bytes, otherwise all lines are checked.
+        """
+        if isinstance(self.read_lines, MappedDeck):
+            return self.read_lines.card_indices().tolist()
+        return range(len(self.read_lines))
+
     def search_sets(self, set_type: str) -> list:
         """
         Searches for sets inside the file and stores its name and number of elements
@@ -74,7 +309,7 @@ class FileProcessor:
         sets = []
         data_values = []
 
-        for i in range(len(self.read_lines)):
+        for i in self._card_lines():
             line = self.read_lines[i]
 
             # If a set is found
@@ -107,65 +342,53 @@ class FileProcessor:
 
         return sets, data_values
 
-    def search_orientation(self) -> list:
+    def search_orientation(self) -> tuple:
         """
-        Searches for orientation cards inside the input file and outputs useful information.
+        Searches for orientation cards inside the input file and outputs useful information. All
+        cards are gathered in a (N, 6) array and their local systems are computed at once.
 
         Returns:
-            orientation_list (list):
-            x_local_list (list): (i, j k) vector for each x local axis
-            y_local_list (list): (i, j k) vector for each y local axis
-            z_local_list (list): (i, j k) vector for each z local axis
-            x_angle_list (list): angle between each x local axis and x global axis
-            y_angle_list (list): angle between each y local axis and y global axis
-            z_angle_list (list): angle between each z local axis and z global axis
+            orientation_list (list): name of each orientation card
+            x_local_array (np.ndarray): (N, 3) array with the (i, j, k) vector of each x local axis
+            y_local_array (np.ndarray): (N, 3) array with the (i, j, k) vector of each y local axis
+            z_local_array (np.ndarray): (N, 3) array with the (i, j, k) vector of each z local axis
+            x_angle_array (np.ndarray): angle between each x local axis and x global axis
+            y_angle_array (np.ndarray): angle between each y local axis and y global axis
+            z_angle_array (np.ndarray): angle between each z local axis and z global axis
         """
         orientation_list = []
-        x_local_list = []
-        y_local_list = []
-        z_local_list = []
-        x_angle_list = []
-        y_angle_list = []
-        z_angle_list = []
-
-        for i in range(len(self.read_lines)):
+        definitions = []
+
+        # Empty the orientation lines so that repeated calls do not duplicate them
+        self.orientation_line = []
+
+        for i in self._card_lines():
             line = self.read_lines[i]
 
             # If a orientation card is found
             if "*ORIENTATION" in line.upper():
                 split_line = line.split("=")
-                orientation_name = split_line[-1].strip()
-                input_line = self.read_lines[i+1].split(",")
-                input_line = [float(num) for num in input_line]
-
-                # Vector manipulations
-                vector_x = np.array(input_line[:3])
-                point_xy = np.array(input_line[-3:])
-                x_local = vector_x / np.linalg.norm(vector_x)
-                z_local = np.cross(x_local, point_xy) / \
-                    np.linalg.norm(np.cross(x_local, point_xy))
-                y_local = np.cross(z_local, x_local)
-
-                # Angle calculation
-                angle_x = np.degrees(
-                    np.arccos(np.dot(x_local, np.array([1, 0, 0]))))
-                angle_y = np.degrees(
-                    np.arccos(np.dot(y_local, np.array([0, 1, 0]))))
-                angle_z = np.degrees(
-                    np.arccos(np.dot(z_local, np.array([0, 0, 1]))))
-
-                # List append
-                orientation_list.append(orientation_name)
-                x_local_list.append(x_local.tolist())
-                y_local_list.append(y_local.tolist())
-                z_local_list.append(z_local.tolist())
-                x_angle_list.append(angle_x)
-                y_angle_list.append(angle_y)
-                z_angle_list.append(angle_z)
+                orientation_list.append(split_line[-1].strip())
+                definitions.append(self.read_lines[i+1].split(","))
                 self.orientation_line.append(i)
 
-        return (orientation_list, x_local_list, y_local_list, z_local_list,
-                x_angle_list, y_angle_list, z_angle_list)
+        input_array = np.array(definitions, dtype=float).reshape(-1, 6)
+
+        # Vector manipulations
+        vector_x = input_array[:, :3]
+        point_xy = input_array[:, 3:]
+        x_local = vector_x / np.linalg.norm(vector_x, axis=1, keepdims=True)
+        z_local = np.cross(x_local, point_xy)
+        z_local /= np.linalg.norm(z_local, axis=1, keepdims=True)
+        y_local = np.cross(z_local, x_local)
+
+        # Angle calculation, the dot products with the global axes are the diagonal terms
+        angle_x = np.degrees(np.arccos(np.clip(x_local[:, 0], -1, 1)))
+        angle_y = np.degrees(np.arccos(np.clip(y_local[:, 1], -1, 1)))
+        angle_z = np.degrees(np.arccos(np.clip(z_local[:, 2], -1, 1)))
+
+        return (orientation_list, x_local, y_local, z_local,
+                angle_x, angle_y, angle_z)
 
     def write_input_file(self, optimization_type: str, optimization_set: str, *args: float) -> None:
         """
@@ -177,9 +400,6 @@ class FileProcessor:
             *args (float): angles of rotation for each *ORIENTATION card
         """
 
-        # Empty the modification lines
-        self.modified_lines = []
-
         # Checks if input angles are the same number of orientations
         if len(args) != len(self.orientation_line):
             num_angles = str(len(args))
@@ -187,57 +407,125 @@ class FileProcessor:
             raise ValueError(
                 f"Input angles ({num_angles}) differ from orientations ({num_orientations})")
 
-        # Appends all data before the first *ORIENTATION deck
-        for i in range(self.orientation_line[0]):
-            self.modified_lines.append(self.read_lines[i])
+        self._write_deck(self.output_request(optimization_type, optimization_set), *args)
+
+    def write_multi_target_input_file(self, targets: list, *args: float) -> None:
+        """
+        Rewrites input file to change orientation decks and includes the output requests of
+        several targets, so that all of them are evaluated by a single solver run.
+
+        Args:
+            targets (list): (set, optimization type, criteria, *allowables) of each target
+            *args (float): angles of rotation for each *ORIENTATION card
+        """
+        if len(args) != len(self.orientation_line):
+            num_angles = str(len(args))
+            num_orientations = str(len(self.orientation_line))
+            raise ValueError(
+                f"Input angles ({num_angles}) differ from orientations ({num_orientations})")
 
-        # Appends the rotation angle around Z axis
-        for i in range(len(self.orientation_line)):
-            self.modified_lines.append(
-                self.read_lines[self.orientation_line[i]])
-            self.modified_lines.append(
-                self.read_lines[self.orientation_line[i] + 1])
-            self.modified_lines.append(f"3, {args[i]:.4f}\n")
+        # Each set and output type is requested only once
+        requests = []
+        for optimization_set, optimization_type, *_ in targets:
+            output_request = self.output_request(optimization_type, optimization_set)
+            if output_request not in requests:
+                requests.append(output_request)
 
-        # Appends the rest of the data
-        for i in range(self.orientation_line[-1] + 2, len(self.read_lines)):
-            self.modified_lines.append(self.read_lines[i])
+        self._write_deck("".join(requests), *args)
 
-        # Sets the output request according to user entry
+    def output_request(self, optimization_type: str, optimization_set: str) -> str:
+        """
+        Creates the output request card of an optimization set.
+
+        Args:
+            optimization_type (str): can be "Stress", "Strain" or "Displacement"
+            optimization_set (str): name of the evaluated set
+
+        Returns:
+            output_request (str): *NODE PRINT or *EL PRINT card with its data line
+        """
         if optimization_type == "Displacement":
-            output_request = "*NODE PRINT, NSET=" + optimization_set + "\nU\n"
-        elif optimization_type == "Stress":
-            output_request = "*EL PRINT, ELSET=" + optimization_set + "\nS\n"
-        elif optimization_type == "Strain":
-            output_request = "*EL PRINT, ELSET=" + optimization_set + "\nE\n"
-        else:
-            raise ValueError("Invalid")
+            return "*NODE PRINT, NSET=" + optimization_set + "\nU\n"
+        if optimization_type == "Stress":
+            return "*EL PRINT, ELSET=" + optimization_set + "\nS\n"
+        if optimization_type == "Strain":
+            return "*EL PRINT, ELSET=" + optimization_set + "\nE\n"
+        raise ValueError("Invalid")
+
+    def _write_deck(self, output_request: str, *args: float) -> None:
+        """
+        Writes the modified input file with the rotation angles and the output request.
+
+        Args:
+            output_request (str): output request cards included at the end of the step
+            *args (float): angles of rotation for each *ORIENTATION card
+        """
+        last_orientation = self.orientation_line[-1] + 2
+        request_lines = self._output_request_lines(last_orientation)
 
-        # Finds the *END STEP card of the file
-        for i in range(len(self.modified_lines)):
-            # Compatibility with PrePoMax v1.3.5.1
-            if "** END STEP" in self.modified_lines[i].upper():
-                end_step_line = i
-                compatibility_prepomax = True
-                break
-            elif "*END STEP" in self.modified_lines[i].upper():
-                end_step_line = i
-                compatibility_prepomax = False
-
-        # Writes the output request just above the end of the step
         with open(self.output_file + ".inp", 'w', encoding="utf-8") as file:
-            if compatibility_prepomax:
-                file.writelines(self.modified_lines[:end_step_line - 1])
-                file.writelines(output_request)
-                file.writelines(self.modified_lines[end_step_line - 1:])
-            else:
-                file.writelines(self.modified_lines[:end_step_line])
-                file.writelines(output_request)
-                file.writelines(self.modified_lines[end_step_line:])
+
+            # Writes all data before the first *ORIENTATION deck
+            file.write(self._lines_text(0, self.orientation_line[0]))
+
+            # Writes the rotation angle around Z axis
+            for i in range(len(self.orientation_line)):
+                file.write(self._lines_text(self.orientation_line[i],
+                                            self.orientation_line[i] + 2))
+                file.write(f"3, {args[i]:.4f}\n")
+
+            # Writes the rest of the data with the output request just above the end of each step
+            previous_line = last_orientation
+            for request_line in request_lines:
+                file.write(self._lines_text(previous_line, request_line))
+                file.write(output_request)
+                previous_line = request_line
+            file.write(self._lines_text(previous_line, len(self.read_lines)))
+
+    def _lines_text(self, start: int, end: int) -> str:
+        """
+        Text of a range of lines of the input file
+
+        Args:
+            start (int): index of the first line
+            end (int): index after the last line
+        """
+        if isinstance(self.read_lines, MappedDeck):
+            return self.read_lines.text(start, end)
+        return "".join(self.read_lines[start:end])
+
+    def _output_request_lines(self, start: int) -> list:
+        """
+        Finds the lines where the output request is included, just above the *END STEP card of
+        each step.
+
+        Args:
+            start (int): index of the first line searched
+
+        Returns:
+            request_lines (list): index of the line that follows the output request in each step
+        """
+        request_lines = []
+        prepomax_line = None
+        for i in self._card_lines():
+            if i < start:
+                continue
+            # Compatibility with PrePoMax v1.3.5.1
+            if "** END STEP" in self.read_lines[i].upper():
+                prepomax_line = i - 1
+            elif "*END STEP" in self.read_lines[i].upper():
+                request_lines.append(i if prepomax_line is None else prepomax_line)
+                prepomax_line = None
+
+        if not request_lines:
+            raise ValueError("The *END STEP card could not be found")
+        return request_lines
 
     def retrieve_results(self, optimization_type: str) -> None:
         """
-        Retrieve the results from a dat file and stores them locally in the class.
+        Retrieve the results from a dat file and stores them locally in the class. The blocks of
+        all steps are stored in sequence and the number of values of each step is kept in
+        self.step_sizes.
 
         Args:
             optimization_type (str): can be "Stress", "Strain" or "Displacement"
@@ -252,50 +540,38 @@ class FileProcessor:
         self.uxx_values = []
         self.uyy_values = []
         self.uzz_values = []
+        self.step_sizes = []
+        self.result_ids = None
 
-        if optimization_type == "Stress":
-            with open(self.output_file + ".dat", 'r', encoding="utf-8") as file:
+        if optimization_type not in RESULT_COLUMNS:
+            return
 
-                # Header skip
-                for _ in range(3):
-                    next(file)
+        blocks = [values for block_type, _, values in self.parse_result_blocks()
+                  if block_type == optimization_type and len(values) > 0]
+        if not blocks:
+            raise CalculixError(f"No results were found in {self.output_file}.dat")
 
-                for line in file:
-                    elements = line.split()
-                    self.sxx_values.append(float(elements[2]))
-                    self.syy_values.append(float(elements[3]))
-                    self.sxy_values.append(float(elements[5]))
+        try:
+            all_values = np.concatenate(blocks)
+            values = all_values[:, list(RESULT_COLUMNS[optimization_type])]
+        except (IndexError, ValueError) as error:
+            raise CalculixError(
+                f"The results file {self.output_file}.dat is truncated") from error
+        self.step_sizes = [len(block) for block in blocks]
+        self.result_ids = all_values[:, 0].astype(np.int64)
 
+        if optimization_type == "Stress":
+            self.sxx_values, self.syy_values, self.sxy_values = values.T.tolist()
         elif optimization_type == "Strain":
-            with open(self.output_file + ".dat", 'r', encoding="utf-8") as file:
-
-                # Header skip
-                for _ in range(3):
-                    next(file)
-
-                for line in file:
-                    elements = line.split()
-                    self.exx_values.append(float(elements[2]))
-                    self.eyy_values.append(float(elements[3]))
-                    self.exy_values.append(float(elements[5]))
-
+            self.exx_values, self.eyy_values, self.exy_values = values.T.tolist()
         elif optimization_type == "Displacement":
-            with open(self.output_file + ".dat", 'r', encoding="utf-8") as file:
-
-                # Header skip
-                for _ in range(3):
-                    next(file)
-
-                for line in file:
-                    elements = line.split()
-                    self.uxx_values.append(float(elements[1]))
-                    self.uyy_values.append(float(elements[2]))
-                    self.uzz_values.append(float(elements[3]))
+            self.uxx_values, self.uyy_values, self.uzz_values = values.T.tolist()
 
     def process_results(
             self, optimization_type: str, optimization_criteria: str, *args: float) -> float:
         """
-        Processes the results of the *.dat file.
+        Processes the results of the *.dat file. When there is more than one step, the criteria
+        is evaluated for each step and the envelope (most critical step) is returned.
 
         Args:
             optimization_type (str): can be "Stress", "Strain" or "Displacement"
@@ -310,83 +586,239 @@ class FileProcessor:
                 criteria, such as higher Tsai-Hill index, average displacement, etc.    
         """
         if optimization_type == "Stress":
+            results = (self.sxx_values, self.syy_values, self.sxy_values)
+        elif optimization_type == "Strain":
+            results = (self.exx_values, self.eyy_values, self.exy_values)
+        elif optimization_type == "Displacement":
+            results = (self.uxx_values, self.uyy_values, self.uzz_values)
+        else:
+            raise ValueError("Invalid")
+
+        indices = self.failure_indices(optimization_type, *results, *args)
+        step_sizes = self.step_sizes or [len(indices)]
+
+        step_values = [self._reduce_criteria(step_indices, optimization_criteria)
+                       for step_indices in np.split(indices, np.cumsum(step_sizes)[:-1])]
+
+        return max(step_values)
+
+    def _reduce_criteria(self, indices: np.ndarray, optimization_criteria: str) -> float:
+        """
+        Outputs a value of the failure indices of one step according to the criteria choosen,
+        shared by all the ways of processing the results.
+
+        Args:
+            indices (np.ndarray): (n, k) failure indices or components of the step
+            optimization_criteria (str): "Max" for the highest value or "Average" for the
+                highest average of the k columns
+
+        Returns:
+            max_value (float): most critical value of the step
+        """
+        if optimization_criteria == "Max":
+            return float(indices.max())
+        if optimization_criteria == "Average":
+            return float(indices.mean(axis=0).max())
+
+        raise ValueError("Invalid")
+
+    def search_element_regions(self) -> np.ndarray:
+        """
+        Maps each element to the *ORIENTATION card of its section. The element sets come from
+        the *ELSET cards and the ELSET= parameter of the *ELEMENT cards, and the orientation of
+        each set comes from the ORIENTATION= parameter of the *SHELL SECTION and *SOLID SECTION
+        cards (or from the first layer of composite sections).
+
+        Returns:
+            element_region (np.ndarray): index of the orientation card of each element ID, -1 for
+                elements without orientation
+        """
+        if self.orientation_data is None:
+            self.orientation_data = self.search_orientation()
+        region_names = [name.upper() for name in self.orientation_data[0]]
+
+        element_sets = {}
+        sections = []
+        max_element = 0
+
+        card_lines = list(self._card_lines())
+        for index in card_lines:
+            line = self.read_lines[index]
+            keyword = line.split(",")[0].strip().upper()
+            parameters = {}
+            for part in line.split(",")[1:]:
+                key, _, value = part.partition("=")
+                parameters[key.strip().upper()] = value.strip().upper()
+
+            if keyword not in ("*ELEMENT", "*ELSET", "*SHELL SECTION", "*SOLID SECTION"):
+                continue
+
+            # Data lines of the card
+            data_lines = []
+            for j in range(index + 1, len(self.read_lines)):
+                data_line = self.read_lines[j]
+                if data_line.startswith("*"):
+                    break
+                if data_line.strip():
+                    data_lines.append(data_line)
+
+            if keyword == "*ELEMENT":
+                ids = []
+                continuation = False
+                for data_line in data_lines:
+                    if not continuation:
+                        ids.append(int(data_line.split(",")[0]))
+                    continuation = data_line.rstrip().endswith(",")
+                max_element = max([max_element] + ids)
+                if "ELSET" in parameters:
+                    element_sets.setdefault(parameters["ELSET"], []).extend(ids)
+
+            elif keyword == "*ELSET":
+                members = element_sets.setdefault(parameters["ELSET"], [])
+                fields = [field.strip() for data_line in data_lines
+                          for field in data_line.split(",") if field.strip()]
+                if "GENERATE" in parameters:
+                    for k in range(0, len(fields) - 1, 3):
+                        step = int(fields[k + 2]) if k + 2 < len(fields) else 1
+                        members.extend(range(int(fields[k]), int(fields[k + 1]) + 1, step))
+                else:
+                    for field in fields:
+                        if field.isdigit():
+                            members.append(int(field))
+                        else:
+                            members.extend(element_sets.get(field.upper(), []))
 
-            if len(args) == 6:
-                calculation_methodology, x11t, x11c, x22t, x22c, x12 = args
             else:
-                raise ValueError("Stress calculation requires 6 args")
+                orientation = parameters.get("ORIENTATION")
+                if orientation is None and "COMPOSITE" in parameters and data_lines:
+                    layer = data_lines[0].split(",")
+                    if len(layer) >= 4 and layer[3].strip():
+                        orientation = layer[3].strip().upper()
+                if orientation in region_names and "ELSET" in parameters:
+                    sections.append((parameters["ELSET"], region_names.index(orientation)))
+
+        self.element_region = np.full(max_element + 1, -1, dtype=np.int64)
+        for elset, region in sections:
+            members = np.array(element_sets.get(elset, []), dtype=np.int64)
+            self.element_region[members[members <= max_element]] = region
+
+        return self.element_region
+
+    def process_results_by_region(
+            self, optimization_type: str, optimization_criteria: str, *args: float) -> tuple:
+        """
+        Processes the results of the *.dat file for each orientation region with grouped
+        reductions, besides the scalar of process_results. Only element results can be grouped.
 
-            if calculation_methodology == "Tsai-Hill":
-                tsai_hill_output = []
+        Args:
+            optimization_type (str): can be "Stress" or "Strain"
+            optimization_criteria (str): can be "Max" or "Average"
+            *args: same allowables as process_results
 
-                # Calculates the Tsai-Hill failure index according to the signal (+ -)
-                for i in range(len(self.sxx_values)):
-                    x_stress = self.sxx_values[i]
-                    y_stress = self.syy_values[i]
-                    xy_stress = self.sxy_values[i]
+        Returns:
+            max_value (float): same output of process_results
+            region_values (np.ndarray): value of each *ORIENTATION card region, in the order of
+                search_orientation, NaN for regions without results in the evaluated set
+        """
+        if optimization_type == "Stress":
+            results = (self.sxx_values, self.syy_values, self.sxy_values)
+        elif optimization_type == "Strain":
+            results = (self.exx_values, self.eyy_values, self.exy_values)
+        else:
+            raise ValueError(f"{optimization_type} results can not be grouped by region")
 
-                    if self.sxx_values[i] < 0:
-                        x11 = x11c
-                    else:
-                        x11 = x11t
+        if self.element_region is None:
+            self.search_element_regions()
+        num_regions = len(self.orientation_data[0])
 
-                    if self.syy_values[i] < 0:
-                        x22 = x22c
-                    else:
-                        x22 = x22t
+        indices = self.failure_indices(optimization_type, *results, *args)
+        ids = self.result_ids
+        regions = np.full(len(ids), -1, dtype=np.int64)
+        known = ids < len(self.element_region)
+        regions[known] = self.element_region[ids[known]]
 
-                    failure_index = (x_stress / x11) ** 2 + (y_stress / x22) ** 2 + \
-                        (xy_stress / x12) ** 2 - \
-                        x_stress * y_stress / (x11 ** 2)
-                    tsai_hill_output.append(failure_index)
+        max_value = None
+        region_values = np.full(num_regions, np.nan)
+        step_sizes = self.step_sizes or [len(indices)]
+        step_starts = np.cumsum(step_sizes)[:-1]
 
-                # Outputs a value according to the criteria choosen
-                if optimization_criteria == "Max":
-                    return max(tsai_hill_output)
-                if optimization_criteria == "Average":
-                    return sum(tsai_hill_output) / len(tsai_hill_output)
+        for step_indices, step_regions in zip(np.split(indices, step_starts),
+                                              np.split(regions, step_starts)):
 
-            if calculation_methodology == "Max stress":
-                sxx_ratios = []
-                syy_ratios = []
-                sxy_ratios = []
-
-                # Calculates the ratio of max stress according to signal (+ -)
-                for i in range(len(self.sxx_values)):
-                    x_stress = self.sxx_values[i]
-                    y_stress = self.syy_values[i]
-                    xy_stress = self.sxy_values[i]
-
-                    if self.sxx_values[i] < 0:
-                        x11 = x11c
-                    else:
-                        x11 = x11t
+            # Same scalar of process_results, over all the results of the step
+            step_max = self._reduce_criteria(step_indices, optimization_criteria)
+            max_value = step_max if max_value is None else max(max_value, step_max)
 
-                    if self.syy_values[i] < 0:
-                        x22 = x22c
-                    else:
-                        x22 = x22t
+            in_region = step_regions >= 0
+            step_indices, step_regions = step_indices[in_region], step_regions[in_region]
+            if len(step_regions) == 0:
+                continue
+
+            if optimization_criteria == "Max":
+                # Max of each region over the values sorted by region
+                order = np.argsort(step_regions, kind="stable")
+                sorted_regions = step_regions[order]
+                starts = np.flatnonzero(np.diff(sorted_regions, prepend=-1))
+                step_values = np.full(num_regions, np.nan)
+                step_values[sorted_regions[starts]] = np.maximum.reduceat(
+                    step_indices.max(axis=1)[order], starts)
+
+            else:
+                counts = np.bincount(step_regions, minlength=num_regions)
+                sums = np.stack([np.bincount(step_regions, weights=step_indices[:, k],
+                                             minlength=num_regions)
+                                 for k in range(step_indices.shape[1])], axis=1)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    step_values = (sums / counts[:, np.newaxis]).max(axis=1)
+
+            # Envelope of the steps
+            region_values = np.fmax(region_values, step_values)
+
+        return max_value, region_values
+
+    def failure_indices(
+            self, optimization_type: str, xx_values, yy_values, xy_values, *args) -> np.ndarray:
+        """
+        Vectorized calculation of the failure indices of each evaluated point.
+
+        Args:
+            optimization_type (str): can be "Stress", "Strain" or "Displacement"
+            xx_values (np.ndarray): sxx, exx or ux values
+            yy_values (np.ndarray): syy, eyy or uy values
+            xy_values (np.ndarray): sxy, exy or uz values
+            *args: same allowables as process_results
+
+        Returns:
+            indices (np.ndarray): array with the input shape plus a last axis holding one column
+                per evaluated component (Tsai-Hill index, each max stress/strain ratio or the
+                displacement magnitude)
+        """
+        xx_values = np.asarray(xx_values, dtype=float)
+        yy_values = np.asarray(yy_values, dtype=float)
+        xy_values = np.asarray(xy_values, dtype=float)
+
+        if optimization_type == "Stress":
 
-                    sxx_failure_index = abs(x_stress / x11)
-                    syy_failure_index = abs(y_stress / x22)
-                    sxy_failure_index = abs(xy_stress / x12)
+            if len(args) == 6:
+                calculation_methodology, x11t, x11c, x22t, x22c, x12 = args
+            else:
+                raise ValueError("Stress calculation requires 6 args")
 
-                    sxx_ratios.append(sxx_failure_index)
-                    syy_ratios.append(syy_failure_index)
-                    sxy_ratios.append(sxy_failure_index)
+            # Allowables according to the signal (+ -)
+            x11 = np.where(xx_values < 0, x11c, x11t)
+            x22 = np.where(yy_values < 0, x22c, x22t)
 
-                # Outputs a value according to the criteria choosen
-                if optimization_criteria == "Max":
-                    max_sxx = max(sxx_ratios)
-                    max_syy = max(syy_ratios)
-                    max_sxy = max(sxy_ratios)
-                    return max(max_sxx, max_syy, max_sxy)
+            if calculation_methodology == "Tsai-Hill":
+                failure_index = (xx_values / x11) ** 2 + (yy_values / x22) ** 2 + \
+                    (xy_values / x12) ** 2 - xx_values * yy_values / (x11 ** 2)
+                return failure_index[..., np.newaxis]
+
+            if calculation_methodology == "Max stress":
+                return np.stack((np.abs(xx_values / x11),
+                                 np.abs(yy_values / x22),
+                                 np.abs(xy_values / x12)), axis=-1)
 
-                if optimization_criteria == "Average":
-                    average_sxx = sum(sxx_ratios) / len(sxx_ratios)
-                    average_syy = sum(syy_ratios) / len(syy_ratios)
-                    average_sxy = sum(sxy_ratios) / len(sxy_ratios)
-                    return max(average_sxx, average_syy, average_sxy)
+            raise ValueError(f"Invalid stress methodology: {calculation_methodology}")
 
         if optimization_type == "Strain":
 
@@ -395,64 +827,225 @@ class FileProcessor:
             else:
                 raise ValueError("Strain calculation requires 5 args")
 
-            exx_ratios = []
-            eyy_ratios = []
-            exy_ratios = []
+            e11 = np.where(xx_values < 0, e11c, e11t)
+            e22 = np.where(yy_values < 0, e22c, e22t)
+            return np.stack((np.abs(xx_values / e11),
+                             np.abs(yy_values / e22),
+                             np.abs(xy_values / e12)), axis=-1)
 
-            # Calculates the ratio of max stress according to signal (+ -)
-            for i in range(len(self.exx_values)):
-                x_strain = self.exx_values[i]
-                y_strain = self.eyy_values[i]
-                xy_strain = self.exy_values[i]
+        if optimization_type == "Displacement":
+            magnitude = np.sqrt(xx_values ** 2 + yy_values ** 2 + xy_values ** 2)
+            return magnitude[..., np.newaxis]
 
-                if self.exx_values[i] < 0:
-                    e11 = e11c
-                else:
-                    e11 = e11t
+        raise ValueError("Invalid")
 
-                if self.eyy_values[i] < 0:
-                    e22 = e22c
-                else:
-                    e22 = e22t
+    def stream_results(
+            self, optimization_type: str, optimization_criteria: str, *args: float) -> float:
+        """
+        Same output as retrieve_results followed by process_results, but the *.dat file is read
+        in chunks of self.chunk_size lines and only running max, sum and count of the current
+        step are kept, so the memory usage does not depend on the size of the evaluated set.
 
-                exx_failure_index = abs(x_strain / e11)
-                eyy_failure_index = abs(y_strain / e22)
-                exy_failure_index = abs(xy_strain / e12)
+        Args:
+            optimization_type (str): can be "Stress", "Strain" or "Displacement"
+            optimization_criteria (str): can be "Max" or "Average"
+            *args: same allowables as process_results
 
-                exx_ratios.append(exx_failure_index)
-                eyy_ratios.append(eyy_failure_index)
-                exy_ratios.append(exy_failure_index)
+        Returns:
+            max_value (float): most structural critical value according to optimization type and
+                criteria
+        """
+        if optimization_type not in RESULT_COLUMNS:
+            raise ValueError("Invalid")
+        columns = RESULT_COLUMNS[optimization_type]
+
+        # Invalid allowables are found before the file is read
+        self.failure_indices(optimization_type, [], [], [], *args)
+
+        step_values = []
+        running_max = None
+        running_sum = None
+        count = 0
+        num_columns = None
+
+        def reduce_chunk(data_lines):
+            nonlocal running_max, running_sum, count, num_columns
+            if not data_lines:
+                return
+            # All the columns are read, so lines cut while written are found
+            try:
+                values = np.loadtxt(data_lines, ndmin=2)
+            except ValueError as error:
+                raise CalculixError(
+                    f"The results file {self.output_file}.dat is truncated") from error
+            if num_columns is None:
+                num_columns = values.shape[1]
+            if values.shape[1] != num_columns or num_columns <= max(columns):
+                raise CalculixError(f"The results file {self.output_file}.dat is truncated")
+            values = values[:, list(columns)]
+            indices = self.failure_indices(
+                optimization_type, values[:, 0], values[:, 1], values[:, 2], *args)
+
+            # Running reductions of the current step
+            if count == 0:
+                running_max = indices.max(axis=0)
+                running_sum = indices.sum(axis=0)
+            else:
+                running_max = np.maximum(running_max, indices.max(axis=0))
+                running_sum += indices.sum(axis=0)
+            count += len(indices)
+
+        def close_step():
+            nonlocal count
+            if count == 0:
+                return
+            # The running reduction used by the criteria is a single row with the same result
+            summary = running_sum / count if optimization_criteria == "Average" else running_max
+            step_values.append(self._reduce_criteria(summary[np.newaxis], optimization_criteria))
+            count = 0
 
-            # Outputs a value according to the criteria choosen
-            if optimization_criteria == "Max":
-                max_exx = max(exx_ratios)
-                max_eyy = max(eyy_ratios)
-                max_exy = max(exy_ratios)
-                return max(max_exx, max_eyy, max_exy)
+        try:
+            file = open(self.output_file + ".dat", 'r', encoding="utf-8")
+        except OSError as error:
+            raise CalculixError(f"The results file {self.output_file}.dat is missing") from error
+
+        with file:
+            data_lines = []
+            for line in file:
+                stripped = line.strip()
+                if not stripped:
+                    continue
+
+                if stripped[0].isdigit():
+                    data_lines.append(line)
+                    if len(data_lines) >= self.chunk_size:
+                        reduce_chunk(data_lines)
+                        data_lines = []
+                    continue
+
+                # Each header line starts the block of a new step
+                reduce_chunk(data_lines)
+                data_lines = []
+                close_step()
+
+            reduce_chunk(data_lines)
+
+        close_step()
+        if not step_values:
+            raise CalculixError(f"No results were found in {self.output_file}.dat")
+
+        return max(step_values)
+
+    def parse_result_blocks(self) -> list:
+        """
+        Parses all the output blocks of the *.dat file in a single pass.
 
-            if optimization_criteria == "Average":
-                average_exx = sum(exx_ratios) / len(exx_ratios)
-                average_eyy = sum(eyy_ratios) / len(eyy_ratios)
-                average_exy = sum(exy_ratios) / len(exy_ratios)
-                return max(average_exx, average_eyy, average_exy)
+        Returns:
+            blocks (list): (optimization type, set name, values) of each block in the file order,
+                values being an array with all the columns of the data lines
+        """
+        block_types = {
+            "DISPLACEMENTS": "Displacement",
+            "STRESSES": "Stress",
+            "STRAINS": "Strain"
+        }
+        header_pattern = re.compile(r"^\s*(\w+)\s.*\sfor\s*set\s+(\S+)", re.IGNORECASE)
 
-        if optimization_type == "Displacement":
+        blocks = []
+        block_lines = None
+
+        try:
+            file = open(self.output_file + ".dat", 'r', encoding="utf-8")
+        except OSError as error:
+            raise CalculixError(f"The results file {self.output_file}.dat is missing") from error
+
+        with file:
+            # The sentinel line closes the last block
+            for line in itertools.chain(file, ["END OF FILE\n"]):
+                stripped = line.strip()
+                if not stripped:
+                    continue
+
+                if stripped[0].isdigit():
+                    if block_lines is not None:
+                        block_lines.append(line)
+                    continue
+
+                # Any other line closes the current block
+                if block_lines is not None:
+                    try:
+                        blocks[-1][2] = np.loadtxt(block_lines, ndmin=2) if block_lines \
+                            else np.empty((0, 0))
+                    except ValueError as error:
+                        raise CalculixError(
+                            f"The results file {self.output_file}.dat is truncated") from error
+                    block_lines = None
+
+                match = header_pattern.match(line)
+                if match and match.group(1).upper() in block_types:
+                    blocks.append([block_types[match.group(1).upper()],
+                                   match.group(2).upper(), None])
+                    block_lines = []
+
+        return [tuple(block) for block in blocks]
+
+    def evaluate_values(self, optimization_type: str, optimization_criteria: str,
+                        values: np.ndarray, *args: float) -> float:
+        """
+        Applies the optimization criteria to the values of one *.dat block.
 
-            u_magnitude = []
+        Args:
+            optimization_type (str): can be "Stress", "Strain" or "Displacement"
+            optimization_criteria (str): can be "Max" or "Average"
+            values (np.ndarray): all the columns of the block data lines
+            *args: same allowables as process_results
 
-            for i in range(len(self.uxx_values)):
-                uxx_value = self.uxx_values[i]
-                uyy_value = self.uyy_values[i]
-                uzz_value = self.uzz_values[i]
-                resultant = (uxx_value ** 2 + uyy_value **
-                             2 + uzz_value ** 2) ** 0.5
+        Returns:
+            max_value (float): most structural critical value according to optimization type and
+                criteria
+        """
+        if len(values) == 0:
+            raise CalculixError(f"No results were found in {self.output_file}.dat")
 
-                u_magnitude.append(resultant)
+        columns = values[:, list(RESULT_COLUMNS[optimization_type])]
+        indices = self.failure_indices(
+            optimization_type, columns[:, 0], columns[:, 1], columns[:, 2], *args)
 
-            if optimization_criteria == "Max":
-                return max(u_magnitude)
-            if optimization_criteria == "Average":
-                return sum(u_magnitude) / len(u_magnitude)
+        return self._reduce_criteria(indices, optimization_criteria)
+
+    def process_targets(self, targets: list, blocks: list = None) -> list:
+        """
+        Evaluates several targets from the blocks of a single *.dat file. If a set has more than
+        one block, the most critical value is kept.
+
+        Args:
+            targets (list): (set, optimization type, criteria, *allowables) of each target
+            blocks (list): blocks already parsed by parse_result_blocks, the *.dat file is parsed
+                if None
+
+        Returns:
+            target_values (list): value of each target, in the same order
+        """
+        if blocks is None:
+            blocks = self.parse_result_blocks()
+
+        target_values = []
+        for optimization_set, optimization_type, optimization_criteria, *allowables in targets:
+            values = [
+                self.evaluate_values(optimization_type, optimization_criteria, data, *allowables)
+                for block_type, block_set, data in blocks
+                if block_type == optimization_type and block_set == optimization_set.upper()]
+
+            # The other sets have results, so the target itself is wrong
+            if not values and blocks:
+                raise ValueError(
+                    f"No {optimization_type} results for set {optimization_set} in "
+                    f"{self.output_file}.dat")
+            if not values:
+                raise CalculixError(f"No results were found in {self.output_file}.dat")
+            target_values.append(max(values))
+
+        return target_values
 
     def run_calculix(self, work_directory: str, ccx_name: str, file_name: str) -> float:
         """
@@ -468,13 +1061,22 @@ class FileProcessor:
         """
 
         os.chdir(work_directory)
-        output = subprocess.check_output(
-            ["start", "/B", "/WAIT", "cmd", "/C", f"{ccx_name} {file_name}"],
-            shell=True,
-            encoding="utf-8"
-        )
+        try:
+            output = subprocess.check_output(
+                ["start", "/B", "/WAIT", "cmd", "/C", f"{ccx_name} {file_name}"],
+                shell=True,
+                encoding="utf-8"
+            )
+        except subprocess.CalledProcessError as error:
+            raise CalculixError(
+                f"CalculiX exited with code {error.returncode} for {file_name}") from error
+
+        # Runs without the time line did not finish (e.g. no convergence)
         time_pattern = r"Total CalculiX Time: (\d+\.\d+)"
         match = re.search(time_pattern, output)
+        if match is None:
+            raise CalculixError(
+                f"CalculiX did not finish the analysis of {file_name}", transient=False)
         time_spent = float(match.group(1))
         return time_spent
 
@@ -486,7 +1088,22 @@ class FileProcessor:
         index of the line is also saved such as orientations, shell sections, composites and solid
         sections.
         """
-        for index, line in enumerate(self.read_lines):
+        # Empty the lists so that repeated searches do not duplicate them
+        self.orientations_list = []
+        self.orientations_index = []
+        self.materials_list = []
+        self.steps_list = []
+        self.nsets_list = []
+        self.elsets_list = []
+        self.solid_section_list = []
+        self.solid_section_index = []
+        self.shell_list = []
+        self.shell_index = []
+        self.composite_list = []
+        self.composite_index = []
+
+        for index in self._card_lines():
+            line = self.read_lines[index]
 
             if "*ORIENTATION" in line.upper():
                 self.orientations_index.append(index)
@@ -529,6 +1146,7 @@ class FileProcessor:
         Args:
             index_list (list): list with the indexes of each composite card in the input file.
         """
+        self.composite_layers = []
 
         for index in index_list:
             num_layers = 0
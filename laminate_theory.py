@@ -0,0 +1,174 @@
+"""
+v.1.0.0 - Basic release
+Classical lamination theory evaluator, used to screen many orientations in process before
+they are confirmed with CalculiX.
+"""
+
+import numpy as np
+from file_manager import FileProcessor
+
+
+class LaminateEvaluator:
+    """CLT backend that outputs ply stresses and strains for many candidate angle sets at once"""
+
+    def __init__(self,
+                 material: tuple,
+                 layups: list,
+                 loads: list
+                 ) -> None:
+        """
+        Class setup variables. Each region is the domain of one *ORIENTATION card, in the same
+        order as search_orientation.
+
+        Args:
+            material (tuple): E11, E22, G12 and NU12 of the ply material
+            layups (list): for each region, a list of (thickness, ply angle) of each layer from
+                bottom to top, the ply angle being measured from the local x-axis of the region
+            loads (list): for each region, the running loads Nx, Ny, Nxy, Mx, My, Mxy in the
+                local system of the *ORIENTATION card (before the optimized rotation)
+        """
+        e11, e22, g12, nu12 = material
+        nu21 = nu12 * e22 / e11
+        denominator = 1 - nu12 * nu21
+
+        # Reduced stiffness matrix of the ply in material axes
+        self.q_matrix = np.array([
+            [e11 / denominator, nu12 * e22 / denominator, 0],
+            [nu12 * e22 / denominator, e22 / denominator, 0],
+            [0, 0, g12]
+        ])
+
+        if len(layups) != len(loads):
+            raise ValueError(f"Layups ({len(layups)}) differ from loads ({len(loads)})")
+
+        self.thicknesses = []
+        self.ply_angles = []
+        self.z_coordinates = []
+        for layup in layups:
+            layup = np.array(layup, dtype=float).reshape(-1, 2)
+            z_interfaces = np.concatenate(([0], np.cumsum(layup[:, 0])))
+            z_interfaces -= z_interfaces[-1] / 2
+
+            self.thicknesses.append(layup[:, 0])
+            self.ply_angles.append(layup[:, 1])
+            self.z_coordinates.append(z_interfaces)
+
+        self.loads = np.array(loads, dtype=float).reshape(-1, 6)
+        self.num_regions = len(self.loads)
+        self.criteria_processor = FileProcessor()
+
+    def _transformation_matrices(self, angles: np.ndarray) -> tuple:
+        """
+        Stress and engineering strain transformation matrices from laminate to material axes.
+
+        Args:
+            angles (np.ndarray): ply angles in degrees, any shape
+
+        Returns:
+            t_stress (np.ndarray): stress transformation, shape of angles plus (3, 3)
+            t_strain (np.ndarray): engineering strain transformation, same shape
+        """
+        radians = np.radians(angles)
+        c, s = np.cos(radians), np.sin(radians)
+        cc, ss, cs = c * c, s * s, c * s
+
+        t_stress = np.stack((
+            np.stack((cc, ss, 2 * cs), axis=-1),
+            np.stack((ss, cc, -2 * cs), axis=-1),
+            np.stack((-cs, cs, cc - ss), axis=-1)), axis=-2)
+        t_strain = np.stack((
+            np.stack((cc, ss, cs), axis=-1),
+            np.stack((ss, cc, -cs), axis=-1),
+            np.stack((-2 * cs, 2 * cs, cc - ss), axis=-1)), axis=-2)
+        return t_stress, t_strain
+
+    def ply_results(self, angles) -> list:
+        """
+        Calculates the ABD matrices and the ply stresses and strains at the bottom and top of
+        each layer for all candidates at once.
+
+        Args:
+            angles: (M, R) rotation angles of M candidates for the R regions
+
+        Returns:
+            results (list): for each region, a tuple of stresses and strains in material axes,
+                both with shape (M, layers, 2, 3). The stresses are S11, S22, S12 and the strains
+                are E11, E22, E12 with tensor shear strain, the same convention as CalculiX.
+        """
+        angles = np.atleast_2d(np.asarray(angles, dtype=float))
+        if angles.shape[1] != self.num_regions:
+            raise ValueError(
+                f"Input angles ({angles.shape[1]}) differ from regions ({self.num_regions})")
+
+        results = []
+        for region in range(self.num_regions):
+            z_interfaces = self.z_coordinates[region]
+
+            # (M, layers) angle of each ply in the laminate axes
+            theta = angles[:, region, np.newaxis] + self.ply_angles[region]
+            t_stress, t_strain = self._transformation_matrices(theta)
+            t_stress_inverse, _ = self._transformation_matrices(-theta)
+            q_bar = t_stress_inverse @ self.q_matrix @ t_strain
+
+            # ABD matrix of each candidate
+            z_top, z_bottom = z_interfaces[1:], z_interfaces[:-1]
+            a_matrix = np.einsum('mkij,k->mij', q_bar, z_top - z_bottom)
+            b_matrix = np.einsum('mkij,k->mij', q_bar, (z_top ** 2 - z_bottom ** 2) / 2)
+            d_matrix = np.einsum('mkij,k->mij', q_bar, (z_top ** 3 - z_bottom ** 3) / 3)
+            abd_matrix = np.block([[a_matrix, b_matrix], [b_matrix, d_matrix]])
+
+            # Mid-plane strains and curvatures
+            loads = np.broadcast_to(self.loads[region], (len(angles), 6))
+            deformations = np.linalg.solve(abd_matrix, loads[..., np.newaxis])[..., 0]
+            mid_strains, curvatures = deformations[:, :3], deformations[:, 3:]
+
+            # (M, layers, 2, 3) strains at the bottom and top of each ply
+            z_points = np.stack((z_bottom, z_top), axis=-1)
+            strains = mid_strains[:, np.newaxis, np.newaxis, :] + \
+                z_points[np.newaxis, :, :, np.newaxis] * curvatures[:, np.newaxis, np.newaxis, :]
+            stresses = np.einsum('mkij,mkpj->mkpi', q_bar, strains)
+
+            # Material axes
+            stresses = np.einsum('mkij,mkpj->mkpi', t_stress, stresses)
+            strains = np.einsum('mkij,mkpj->mkpi', t_strain, strains)
+            strains[..., 2] /= 2
+
+            results.append((stresses, strains))
+
+        return results
+
+    def evaluate(self, angles, optimization_type: str, optimization_criteria: str,
+                 *args: float) -> np.ndarray:
+        """
+        Objective of each candidate with the same criteria of FileProcessor.process_results.
+
+        Args:
+            angles: (M, R) rotation angles of M candidates for the R regions
+            optimization_type (str): can be "Stress" or "Strain"
+            optimization_criteria (str): can be "Max" or "Average"
+            *args: same allowables as process_results
+
+        Returns:
+            objectives (np.ndarray): (M,) most critical value of each candidate
+        """
+        if optimization_type == "Stress":
+            result_index = 0
+        elif optimization_type == "Strain":
+            result_index = 1
+        else:
+            raise ValueError(f"{optimization_type} is not available in the CLT evaluator")
+
+        indices = []
+        for region_results in self.ply_results(angles):
+            values = region_results[result_index]
+            region_indices = self.criteria_processor.failure_indices(
+                optimization_type, values[..., 0], values[..., 1], values[..., 2], *args)
+            indices.append(region_indices.reshape(len(values), -1, region_indices.shape[-1]))
+        indices = np.concatenate(indices, axis=1)
+
+        if optimization_criteria == "Max":
+            return indices.max(axis=(1, 2))
+        if optimization_criteria == "Average":
+            return indices.mean(axis=1).max(axis=1)
+
+        raise ValueError("Invalid")
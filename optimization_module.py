@@ -5,8 +5,18 @@ Optimization module for optComp software
 
 import os
 import time
+import itertools
+import functools
+import queue
+import shutil
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import nevergrad as ng
-from file_manager import FileProcessor
+from file_manager import FileProcessor, CalculixError
+from batch_deck import BatchDeckWriter
+from profiling import StageProfiler
 
 # File processor class initialization
 
@@ -20,7 +30,8 @@ class OptimizationModule:
                  opt_set: str,
                  opt_criteria: str,
                  max_iterations: int,
-                 *args: float
+                 *args: float,
+                 memory_map: bool = False
                  ) -> None:
         """
         Class setup variables and FileProcessor class initialization
@@ -35,6 +46,8 @@ class OptimizationModule:
                 followed by X11T, X11C, X22T, X22C, X12 allowables. If opt_type is "Strain",
                 E11T, E11C, E22T, E22C, E12 allowables.If opt_type is "Displacement", not 
                 needed.
+            memory_map (bool): if True, the input file is memory-mapped instead of being stored
+                as a list of lines
         """
         # Time evaluation
         start_time = time.time()
@@ -42,6 +55,21 @@ class OptimizationModule:
         # Standard definitions
         self.calculix_name = "ccx"
         self.work_directory = os.path.dirname(os.path.abspath(__file__))
+        self.streaming_results = False
+        self.discrete_cache = {}
+        self.targets = None
+        self.target_weights = None
+        self.multi_objective = False
+        self.constraints = []
+        self.constraint_penalty = 1e6
+        self.max_retries = 2
+        self.failure_penalty = 1e6
+        self.failures = []
+        self.failure_lock = threading.Lock()
+        self.profiler = None
+        self.region_breakdown = False
+        self.region_weights = None
+        self.region_values = None
 
         # Local variables
         self.opt_type = opt_type
@@ -53,9 +81,10 @@ class OptimizationModule:
         # FileProcessor definitions
         self.opt_object = FileProcessor()
         self.output_file = self.opt_object.output_file
-        self.opt_object.read_file(input_file)
-        aux_out, *_ = self.opt_object.search_orientation()
+        self.opt_object.open_deck(input_file, memory_map=memory_map)
+        aux_out, *_ = self.opt_object.orientation_data
         self.num_variables = len(aux_out)
+        self.orientation_names = list(aux_out)
 
         # Optimizer definitions
         instrum = ng.p.Instrumentation(
@@ -80,14 +109,219 @@ class OptimizationModule:
                 Tsai-Hill failure index, maximum displacement or most critical strain.
         """
 
-        self.opt_object.write_input_file(self.opt_type, self.opt_set, *angles)
-        self.calculix_time = self.opt_object.run_calculix(
-            self.work_directory, self.calculix_name, self.output_file)
-        self.opt_object.retrieve_results(self.opt_type)
-        objective = self.opt_object.process_results(
-            self.opt_type, self.opt_criteria, *self.allowables)
+        objective, self.calculix_time = self._evaluate_safely(self.opt_object, *angles)
         return objective
 
+    def _evaluate_safely(self, processor: FileProcessor, *angles: float) -> tuple:
+        """
+        Evaluates one design, retrying transient CalculiX failures as in _run_with_retries. If
+        the design fails, the failure penalty is returned so that the optimization keeps going.
+
+        Args:
+            processor (FileProcessor): processor that holds the deck and the output file name
+            *angles (float): rotation angles around local z-axis [0,90]
+
+        Returns:
+            objective (float): optimization criteria, or the penalty if the design failed
+            calculix_time (float): time spent in CalculiX run (seconds), None if it failed
+        """
+        result = self._run_with_retries(
+            functools.partial(self._evaluate, processor, *angles), processor, [angles])
+        if result is None:
+            return self._penalty(self.failure_penalty), None
+        return result
+
+    def _run_with_retries(self, evaluation, processor: FileProcessor, angle_sets: list):
+        """
+        Calls the evaluation, retrying transient CalculiX failures up to max_retries times. If it
+        still fails, one failure is stored in self.failures for each design and the deck of the
+        last attempt is kept for inspection. Configuration errors (ValueError) are raised.
+
+        Args:
+            evaluation (callable): writes, solves and post-processes the designs
+            processor (FileProcessor): processor that holds the deck and the output file name
+            angle_sets (list): angles of each design solved by the evaluation
+
+        Returns:
+            result: output of the evaluation, None if it failed
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return evaluation()
+            except CalculixError as error:
+                print(f"Attempt {attempt + 1} failed: {error}")
+                last_error = error
+                if not error.transient:
+                    break
+
+        # The index is reserved under the lock, so parallel failures keep their own decks
+        failures = [{
+            "angles": tuple(float(angle) for angle in angles),
+            "attempts": attempt + 1,
+            "error": str(last_error),
+            "deck": None
+        } for angles in angle_sets]
+        with self.failure_lock:
+            failed_deck = f"{processor.output_file}_failed_{len(self.failures)}.inp"
+            self.failures.extend(failures)
+
+        # The failed deck is copied before the next evaluation overwrites it
+        try:
+            shutil.copyfile(os.path.join(self.work_directory, processor.output_file + ".inp"),
+                            os.path.join(self.work_directory, failed_deck))
+            for failure in failures:
+                failure["deck"] = failed_deck
+        except OSError:
+            pass
+
+        if len(failures) == 1:
+            print(f"Design {failures[0]['angles']} failed, penalty objective is used")
+        else:
+            print(f"Batch of {len(failures)} designs failed, penalty objective is used")
+        return None
+
+    def _evaluate(self, processor: FileProcessor, *angles: float) -> tuple:
+        """
+        Writes, solves and post-processes one design with the given FileProcessor
+
+        Args:
+            processor (FileProcessor): processor that holds the deck and the output file name
+            *angles (float): rotation angles around local z-axis [0,90]
+
+        Returns:
+            objective (float): optimization criteria for minimization
+            calculix_time (float): time spent in CalculiX run (seconds)
+        """
+        if self.targets:
+            with self._stage("write"):
+                processor.write_multi_target_input_file(self.targets, *angles)
+            with self._stage("solve"):
+                calculix_time = processor.run_calculix(
+                    self.work_directory, self.calculix_name, processor.output_file)
+            with self._stage("parse"):
+                blocks = processor.parse_result_blocks()
+            with self._stage("criteria"):
+                target_values = processor.process_targets(self.targets, blocks)
+            return self._combine_targets(target_values), calculix_time
+
+        with self._stage("write"):
+            processor.write_input_file(self.opt_type, self.opt_set, *angles)
+        with self._stage("solve"):
+            calculix_time = processor.run_calculix(
+                self.work_directory, self.calculix_name, processor.output_file)
+
+        if self.streaming_results:
+            with self._stage("parse"):
+                objective = processor.stream_results(
+                    self.opt_type, self.opt_criteria, *self.allowables)
+        elif self.region_breakdown:
+            with self._stage("parse"):
+                processor.retrieve_results(self.opt_type)
+            with self._stage("criteria"):
+                objective, self.region_values = processor.process_results_by_region(
+                    self.opt_type, self.opt_criteria, *self.allowables)
+            if self.region_weights is not None:
+                objective = float(np.nansum(self.region_weights * self.region_values))
+        else:
+            with self._stage("parse"):
+                processor.retrieve_results(self.opt_type)
+            with self._stage("criteria"):
+                objective = processor.process_results(
+                    self.opt_type, self.opt_criteria, *self.allowables)
+        return objective, calculix_time
+
+    def _stage(self, name: str):
+        """
+        Context of one profiled stage. Profiling is only done in the main thread, so parallel
+        evaluations are not profiled.
+
+        Args:
+            name (str): stage name
+        """
+        if self.profiler is None or threading.current_thread() is not threading.main_thread():
+            return contextlib.nullcontext()
+        return self.profiler.stage(name)
+
+    def _combine_targets(self, target_values: list):
+        """
+        Objective of the target values: the list itself in multi-objective mode, otherwise the
+        weighted sum
+
+        Args:
+            target_values (list): value of each target
+        """
+        if self.multi_objective:
+            return target_values
+        return sum(weight * value for weight, value in zip(self.target_weights, target_values))
+
+    def _evaluate_batch(self, writer: BatchDeckWriter, angle_sets: list) -> tuple:
+        """
+        Solves several designs with a single CalculiX run and splits the *.dat blocks of each
+        copy of the model. Failed runs are retried and penalized as in _run_with_retries.
+
+        Args:
+            writer (BatchDeckWriter): writer of the batched input file
+            angle_sets (list): angles of each design
+
+        Returns:
+            objectives (list): objective of each design
+            calculix_time (float): time spent in CalculiX run (seconds), None if it failed
+        """
+        targets = self.targets or [
+            (self.opt_set, self.opt_type, self.opt_criteria, *self.allowables)]
+        requests = list(dict.fromkeys((target[1], target[0]) for target in targets))
+        processor = writer.processor
+
+        def evaluation():
+            writer.write_input_file(angle_sets, requests)
+            calculix_time = processor.run_calculix(
+                self.work_directory, self.calculix_name, processor.output_file)
+            blocks = processor.parse_result_blocks()
+
+            objectives = []
+            for copy in range(len(angle_sets)):
+                copy_targets = [(writer.copy_name(target[0], copy), *target[1:])
+                                for target in targets]
+                target_values = processor.process_targets(copy_targets, blocks)
+                if self.targets:
+                    objectives.append(self._combine_targets(target_values))
+                else:
+                    objectives.append(target_values[0])
+            return objectives, calculix_time
+
+        result = self._run_with_retries(evaluation, processor, angle_sets)
+        if result is None:
+            return [self._penalty(self.failure_penalty)] * len(angle_sets), None
+        return result
+
+    def _worker_processor(self, index: int) -> FileProcessor:
+        """
+        Creates a FileProcessor that shares the deck of the main one but writes its own output
+        files, so that several designs can be solved at the same time.
+
+        Args:
+            index (int): worker number, appended to the output file name
+        """
+        worker = FileProcessor()
+        worker.read_lines = self.opt_object.read_lines
+        worker.orientation_line = self.opt_object.orientation_line
+        worker.chunk_size = self.opt_object.chunk_size
+        worker.orientation_data = self.opt_object.orientation_data
+        worker.element_region = self.opt_object.element_region
+        worker.output_file = f"{self.output_file}_{index}"
+        return worker
+
+    def set_failure_handling(self, max_retries: int, failure_penalty: float):
+        """
+        Changes how failed CalculiX runs are handled
+
+        Args:
+            max_retries (int): number of new attempts after a transient failure
+            failure_penalty (float): objective given to the optimizer when all attempts fail
+        """
+        self.max_retries = max_retries
+        self.failure_penalty = failure_penalty
+
     def change_default_definitions(self, calculix_name, work_directory):
         """
         Changes the opt. module default definitions
@@ -101,38 +335,499 @@ class OptimizationModule:
         self.calculix_name = calculix_name
         self.work_directory = work_directory
 
+    def set_streaming_mode(self, enabled: bool, chunk_size: int = 65536):
+        """
+        Enables or disables the constant-memory reduction of the *.dat file results, useful when
+        the evaluated set holds a very large number of nodes/elements.
+
+        Args:
+            enabled (bool): True to reduce the results while the *.dat file is read
+            chunk_size (int): number of *.dat lines parsed at once
+        """
+        self.streaming_results = enabled
+        self.opt_object.chunk_size = chunk_size
+
+    def set_targets(self, targets: list, weights: list = None, multi_objective: bool = False):
+        """
+        Evaluates several sets and criteria from a single CalculiX run instead of opt_set. The
+        objectives are combined as a weighted sum or kept as a vector for the multi-objective
+        (Pareto) support of nevergrad.
+
+        Args:
+            targets (list): (set, optimization type, criteria, *allowables) of each target, e.g.
+                [("SKIN", "Stress", "Max", "Tsai-Hill", 1500, 1200, 50, 250, 70),
+                 ("TIP", "Displacement", "Max")]
+            weights (list): weight of each target in the sum, 1 for all targets if None
+            multi_objective (bool): if True, the objectives are given to the optimizer as a list
+                and run_optimization returns the Pareto front
+        """
+        if weights is None:
+            weights = [1.0] * len(targets)
+        if len(weights) != len(targets):
+            raise ValueError(f"Weights ({len(weights)}) differ from targets ({len(targets)})")
+
+        self.targets = [tuple(target) for target in targets]
+        self.target_weights = list(weights)
+        self.multi_objective = multi_objective
+
+    def add_constraint(self, constraint):
+        """
+        Adds a constraint on the angles that is checked before CalculiX is called. It is also
+        registered as a nevergrad cheap constraint, so the optimizer tries to repair the violating
+        candidates. Candidates that still violate a constraint get constraint_penalty as objective.
+
+        Args:
+            constraint (callable): receives the angles as a np.ndarray and returns a bool or a
+                float, the constraint is satisfied if True or >= 0
+        """
+        self.constraints.append(constraint)
+        self.optimizer.parametrization.register_cheap_constraint(
+            functools.partial(self._check_parameter_constraint, constraint))
+
+    def add_angle_change_constraint(self, adjacent_pairs: list, max_change: float):
+        """
+        Manufacturing rule that limits the angle change between adjacent regions.
+
+        Args:
+            adjacent_pairs (list): (i, j) indexes of *ORIENTATION cards of adjacent regions
+            max_change (float): max allowed difference between the angles of each pair (degrees)
+        """
+        first, second = np.array(adjacent_pairs, dtype=int).reshape(-1, 2).T
+
+        def angle_change(angles):
+            change = np.abs(angles[first] - angles[second]) % 180
+            change = np.minimum(change, 180 - change)
+            return float(max_change - change.max(initial=0))
+
+        self.add_constraint(angle_change)
+
+    def _check_constraint(self, constraint, angles) -> bool:
+        """Evaluates one constraint for the given angles"""
+        result = constraint(np.asarray(angles, dtype=float))
+        if isinstance(result, (bool, np.bool_)):
+            return bool(result)
+        return result >= 0
+
+    def _check_parameter_constraint(self, constraint, value) -> bool:
+        """Evaluates one constraint for the (args, kwargs) value of the nevergrad parameter"""
+        return self._check_constraint(constraint, value[0])
+
+    def satisfies_constraints(self, angles) -> bool:
+        """
+        Checks all the constraints without running CalculiX
+
+        Args:
+            angles: rotation angle of each *ORIENTATION card
+        """
+        return all(self._check_constraint(constraint, angles) for constraint in self.constraints)
+
+    def _penalty(self, penalty: float):
+        """Objective given to the optimizer for designs that are not solved"""
+        if self.targets and self.multi_objective:
+            return [penalty] * len(self.targets)
+        return penalty
+
+    def warm_start(self, previous_designs: list) -> int:
+        """
+        Seeds the optimizer with the best designs of previous runs, which are evaluated before
+        any other candidate. The angles are matched by *ORIENTATION card name, so designs of
+        slightly modified decks can be used. Cards without a previous angle start at 45 degrees,
+        the center of the bounds.
+
+        Args:
+            previous_designs (list): dictionaries {orientation name: angle}, best design first
+
+        Returns:
+            num_suggested (int): number of designs given to the optimizer
+        """
+        seeds = []
+        for design in previous_designs:
+            previous_angles = {name.upper(): angle for name, angle in design.items()}
+            matched = [name for name in self.orientation_names
+                       if name.upper() in previous_angles]
+
+            if not matched:
+                print("Previous design ignored: no *ORIENTATION card name matches this deck")
+                continue
+
+            angles = np.clip([previous_angles.get(name.upper(), 45.0)
+                              for name in self.orientation_names], 0, 90)
+            seeds.append([float(angle) for angle in angles])
+            print(f"Warm start: {len(matched)} of {self.num_variables} orientations matched")
+
+        # The optimizer asks the last suggestion first
+        for angles in reversed(seeds):
+            self.optimizer.suggest(*angles)
+
+        return len(seeds)
+
+    def close(self) -> None:
+        """
+        Releases the input file, needed with memory_map before the deck is modified or replaced
+        for a new optimization
+        """
+        self.opt_object.close_deck()
+
+    def enable_profiling(self, output_directory: str, snapshot_interval: int = 50):
+        """
+        Profiles each stage of run_optimization (ask, write, solve, parse, criteria and tell)
+        with cProfile and tracks the memory with tracemalloc. The statistics are saved every
+        snapshot_interval iterations and can be summarized with "python profiling.py
+        <output_directory>".
+
+        Args:
+            output_directory (str): directory where the statistics and snapshots are saved
+            snapshot_interval (int): number of iterations between saves
+        """
+        self.profiler = StageProfiler(output_directory, snapshot_interval)
+
+    def enable_region_breakdown(self, weights: list = None):
+        """
+        Evaluates the criteria of each *ORIENTATION card region besides the scalar objective.
+        The values of the last evaluation are kept in self.region_values. If weights are given,
+        the objective is the weighted sum of the region values. Only "Stress" and "Strain"
+        optimizations without streaming mode or targets can be broken down.
+
+        Args:
+            weights (list): weight of each orientation region, in the order of the cards
+        """
+        if self.opt_type not in ("Stress", "Strain"):
+            raise ValueError(f"{self.opt_type} results can not be grouped by region")
+        if weights is not None and len(weights) != self.num_variables:
+            raise ValueError(
+                f"Weights ({len(weights)}) differ from orientations ({self.num_variables})")
+
+        self.opt_object.search_element_regions()
+        self.region_breakdown = True
+        self.region_weights = None if weights is None else np.asarray(weights, dtype=float)
+
     def run_optimization(self):
         """
         Run command of the optimization
 
         Returns:
-            best_solution (list): Contains the respective best angles given by the optimizer
+            best_solution (list): Contains the respective best angles given by the optimizer. In
+                multi-objective mode, the angles of each design of the Pareto front.
         """
 
-        for _ in range(self.max_iterations):
+        # The profiler is stopped even if the optimization is interrupted
+        num_iterations = 0
+        try:
+            for iteration in range(self.max_iterations):
+
+                num_iterations = iteration
+                start_time = time.time()
+
+                with self._stage("ask"):
+                    candidate = self.optimizer.ask()
+
+                # Violating candidates are penalized without running CalculiX
+                if not self.satisfies_constraints(candidate.args):
+                    with self._stage("tell"):
+                        self.optimizer.tell(candidate, self._penalty(self.constraint_penalty))
+                    print("Candidate rejected by constraints\n")
+                    self._end_iteration(iteration)
+                    continue
+
+                objective_value = self.objective_function(
+                    *candidate.args, **candidate.kwargs)
+                with self._stage("tell"):
+                    self.optimizer.tell(candidate, objective_value)
+
+                end_time = time.time()
+
+                elapsed_time = end_time - start_time
+                self._end_iteration(iteration)
+
+                if self.calculix_time is None:
+                    print(f"Total time = {elapsed_time:.4f} seconds\n")
+                    continue
+
+                # If needed, one can uncomment below code to study performance
+                percent_runtime = (elapsed_time - self.calculix_time) / elapsed_time * 100
+                print(f"CalculiX time: {self.calculix_time:.4f} seconds")
+                print(f"Total time = {elapsed_time:.4f} seconds")
+                print(f"Optimizer runtime represents {percent_runtime:.2f}% "
+                      "of total time elapsed\n")
+
+            num_iterations = self.max_iterations
+        finally:
+            if self.profiler is not None:
+                self.profiler.stop(num_iterations)
+                self.profiler = None
+
+        if self.targets and self.multi_objective:
+            return [candidate.args for candidate in self.optimizer.pareto_front()]
+
+        best_solution = self.optimizer.provide_recommendation().args
+
+        return best_solution
+
+    def run_batched_optimization(self, batch_size: int):
+        """
+        Run command of the optimization where batch_size candidates are solved by each CalculiX
+        run, as disjoint copies of the model in the same input file. Useful for small models,
+        where the CalculiX startup and file handling take most of the iteration time. Streaming
+        mode, region breakdown and profiling are not supported.
+
+        Args:
+            batch_size (int): number of designs in each CalculiX run
+
+        Returns:
+            best_solution (list): Contains the respective best angles given by the optimizer. In
+                multi-objective mode, the angles of each design of the Pareto front.
+        """
+        if self.streaming_results or self.region_breakdown or self.profiler is not None:
+            raise ValueError("Streaming mode, region breakdown and profiling are not supported "
+                             "in batched mode")
+
+        writer = BatchDeckWriter(self.opt_object)
+        num_evaluations = 0
+
+        while num_evaluations < self.max_iterations:
 
             start_time = time.time()
 
-            candidate = self.optimizer.ask()
-            objective_value = self.objective_function(
-                *candidate.args, **candidate.kwargs)
-            self.optimizer.tell(candidate, objective_value)
+            # Violating candidates are penalized without running CalculiX
+            candidates = []
+            for _ in range(min(batch_size, self.max_iterations - num_evaluations)):
+                candidate = self.optimizer.ask()
+                if self.satisfies_constraints(candidate.args):
+                    candidates.append(candidate)
+                else:
+                    self.optimizer.tell(candidate, self._penalty(self.constraint_penalty))
+                num_evaluations += 1
 
-            end_time = time.time()
+            if not candidates:
+                continue
 
-            elapsed_time = end_time - start_time
+            objectives, self.calculix_time = self._evaluate_batch(
+                writer, [candidate.args for candidate in candidates])
+            for candidate, objective_value in zip(candidates, objectives):
+                self.optimizer.tell(candidate, objective_value)
 
-            # If needed, one can uncomment below code to study performance
-            percent_runtime = (elapsed_time - self.calculix_time) / elapsed_time * 100
-            print(f"CalculiX time: {self.calculix_time:.4f} seconds")
-            print(f"Total time = {elapsed_time:.4f} seconds")
-            print(f"Optimizer runtime represents {percent_runtime:.2f}% of total time elapsed\n")
+            elapsed_time = time.time() - start_time
+            print(f"{len(candidates)} designs solved in {elapsed_time:.4f} seconds\n")
 
+        if self.targets and self.multi_objective:
+            return [candidate.args for candidate in self.optimizer.pareto_front()]
 
         best_solution = self.optimizer.provide_recommendation().args
 
         return best_solution
 
+    def _end_iteration(self, iteration: int) -> None:
+        """Saves the profiling statistics when needed"""
+        if self.profiler is not None:
+            self.profiler.end_iteration(iteration)
+
+    def screen_with_clt(self, evaluator, num_candidates: int = 10000, num_confirmed: int = 5,
+                        seed: int = None):
+        """
+        Screens random designs with the classical lamination theory evaluator and confirms the
+        best ones with CalculiX. The confirmed designs are also given to the optimizer, so a
+        following run_optimization starts from them.
+
+        Args:
+            evaluator (LaminateEvaluator): CLT backend with one region per *ORIENTATION card
+            num_candidates (int): number of designs screened with CLT
+            num_confirmed (int): number of best CLT designs solved with CalculiX
+            seed (int): seed of the random designs
+
+        Returns:
+            best_solution (tuple): best confirmed angles
+            best_objective (float): CalculiX objective of the best confirmed angles
+        """
+        if self.targets and self.multi_objective:
+            raise ValueError("The CLT screening does not support multi-objective targets")
+
+        start_time = time.time()
+
+        rng = np.random.default_rng(seed)
+        candidates = rng.uniform(0, 90, size=(num_candidates, self.num_variables))
+        candidates = candidates[[self.satisfies_constraints(angles) for angles in candidates]]
+        if len(candidates) == 0:
+            raise ValueError("No screened design satisfies the constraints")
+
+        clt_objectives = evaluator.evaluate(
+            candidates, self.opt_type, self.opt_criteria, *self.allowables)
+        best_indices = np.argsort(clt_objectives)[:num_confirmed]
+        print(f"{len(candidates)} designs screened with CLT in "
+              f"{time.time() - start_time:.4f} seconds")
+
+        best_solution = None
+        best_objective = None
+        for index in best_indices:
+            angles = tuple(float(angle) for angle in candidates[index])
+            self.optimizer.suggest(*angles)
+            candidate = self.optimizer.ask()
+            objective = self.objective_function(*candidate.args, **candidate.kwargs)
+            self.optimizer.tell(candidate, objective)
+            print(f"CLT objective = {clt_objectives[index]:.4f}, "
+                  f"CalculiX objective = {objective:.4f}")
+
+            if best_objective is None or objective < best_objective:
+                best_solution, best_objective = candidate.args, objective
+
+        return best_solution, best_objective
+
+    def _canonical_design(self, angles, symmetric_groups: list) -> tuple:
+        """
+        Key shared by all equivalent stack-ups: the fibers are unchanged by 180 degrees rotations
+        and the angles of interchangeable cards can be swapped.
+
+        Args:
+            angles: rotation angle of each *ORIENTATION card
+            symmetric_groups (list): lists of interchangeable card indexes
+        """
+        design = [round(float(angle) % 180, 4) for angle in angles]
+        for group in symmetric_groups:
+            for index, angle in zip(group, sorted(design[i] for i in group)):
+                design[index] = angle
+        return tuple(design)
+
+    def _discrete_designs(self, angle_grid: tuple, symmetric_groups: list):
+        """
+        Generates one design of each class of equivalent stack-ups. Cards of a symmetric group
+        get sorted angles, so each group is enumerated as combinations with replacement.
+
+        Args:
+            angle_grid (tuple): allowed angles for each card
+            symmetric_groups (list): lists of interchangeable card indexes
+        """
+        grouped = {index for group in symmetric_groups for index in group}
+        free_cards = [i for i in range(self.num_variables) if i not in grouped]
+
+        # One factor per group and per free card, so the designs are generated lazily
+        choices = [list(itertools.combinations_with_replacement(angle_grid, len(group)))
+                   for group in symmetric_groups]
+        choices += [angle_grid] * len(free_cards)
+
+        num_groups = len(symmetric_groups)
+        for combination in itertools.product(*choices):
+            design = [0.0] * self.num_variables
+            for group, angles in zip(symmetric_groups, combination[:num_groups]):
+                for index, angle in zip(group, angles):
+                    design[index] = angle
+            for index, angle in zip(free_cards, combination[num_groups:]):
+                design[index] = angle
+            yield tuple(design)
+
+    def run_discrete_optimization(self,
+                                  angle_grid: tuple = (0, 15, 30, 45, 60, 75, 90),
+                                  symmetric_groups: list = None,
+                                  max_workers: int = 1,
+                                  max_evaluations: int = 1000):
+        """
+        Optimization of the fiber angles as discrete variables. When the number of non
+        equivalent designs fits in max_evaluations, all of them are evaluated and the proven
+        optimum is returned, otherwise a discrete optimizer is used with max_evaluations as
+        budget. Results are cached by design during the search, so equivalent stack-ups are
+        solved only once, and designs that violate the constraints are not solved.
+
+        Args:
+            angle_grid (tuple): allowed angles for each card
+            symmetric_groups (list): lists of *ORIENTATION card indexes that are interchangeable
+                due to the model symmetry, e.g. [[0, 3], [1, 2]]
+            max_workers (int): number of CalculiX runs executed in parallel
+            max_evaluations (int): max number of solver runs
+
+        Returns:
+            best_solution (tuple): best angles found
+            best_objective (float): objective of the best angles
+        """
+        symmetric_groups = [list(group) for group in (symmetric_groups or [])]
+        angle_grid = tuple(sorted(set(angle_grid)))
+
+        # Number of non equivalent designs
+        grouped = sum(len(group) for group in symmetric_groups)
+        num_designs = len(angle_grid) ** (self.num_variables - grouped)
+        for group in symmetric_groups:
+            num_designs *= len(list(
+                itertools.combinations_with_replacement(angle_grid, len(group))))
+
+        if self.targets and self.multi_objective:
+            raise ValueError("The discrete search does not support multi-objective targets")
+        if max_evaluations < 1:
+            raise ValueError("max_evaluations must be at least 1")
+
+        # The cached objectives depend on the evaluation settings, so each search starts empty
+        self.discrete_cache = {}
+        num_solved = 0
+
+        # The output files are written relative to the work directory
+        os.chdir(self.work_directory)
+        workers = queue.Queue()
+        for index in range(max_workers):
+            workers.put(self._worker_processor(index))
+
+        def evaluate(design):
+            processor = workers.get()
+            try:
+                objective, _ = self._evaluate_safely(processor, *design)
+            finally:
+                workers.put(processor)
+            return objective
+
+        def evaluate_batch(designs, executor):
+            nonlocal num_solved
+            designs = [design for design in designs if self.satisfies_constraints(design)]
+            keys = [self._canonical_design(design, symmetric_groups) for design in designs]
+            missing = list({key: design for key, design in zip(keys, designs)
+                            if key not in self.discrete_cache}.items())
+            for (key, _), objective in zip(
+                    missing, executor.map(evaluate, [design for _, design in missing])):
+                self.discrete_cache[key] = objective
+            num_solved += len(missing)
+            return designs, [self.discrete_cache[key] for key in keys]
+
+        start_time = time.time()
+        best_solution = None
+        best_objective = None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+            # Exhaustive search, the design space is enumerated in batches
+            if num_designs <= max_evaluations:
+                print(f"Exhaustive search over {num_designs} designs")
+                designs = self._discrete_designs(angle_grid, symmetric_groups)
+                while True:
+                    batch = list(itertools.islice(designs, max(64, max_workers)))
+                    if not batch:
+                        break
+                    for design, objective in zip(*evaluate_batch(batch, executor)):
+                        if best_objective is None or objective < best_objective:
+                            best_solution, best_objective = design, objective
+
+            # Discrete optimizer with a budget of max_evaluations
+            else:
+                print(f"{num_designs} designs exceed {max_evaluations} evaluations, "
+                      "using a discrete optimizer")
+                instrum = ng.p.Instrumentation(
+                    *[ng.p.TransitionChoice(angle_grid) for _ in range(self.num_variables)])
+                optimizer = ng.optimizers.DiscreteOnePlusOne(
+                    parametrization=instrum, budget=max_evaluations, num_workers=max_workers)
+                for num_asked in range(0, max_evaluations, max_workers):
+                    candidates = [optimizer.ask()
+                                  for _ in range(min(max_workers, max_evaluations - num_asked))]
+                    designs, objectives = evaluate_batch(
+                        [candidate.args for candidate in candidates], executor)
+                    objectives = dict(zip(designs, objectives))
+                    for candidate in candidates:
+                        if candidate.args not in objectives:
+                            optimizer.tell(candidate, self.constraint_penalty)
+                            continue
+                        objective = objectives[candidate.args]
+                        optimizer.tell(candidate, objective)
+                        if best_objective is None or objective < best_objective:
+                            best_solution, best_objective = candidate.args, objective
+
+        elapsed_time = time.time() - start_time
+        print(f"Discrete search finished in {elapsed_time:.4f} seconds "
+              f"({num_solved} designs solved)")
+
+        return best_solution, best_objective
+
 class MultiParameterOptimizationModule:
     """
     Optimization module for optComp software that can handle multiple parameters such as different
@@ -0,0 +1,153 @@
+"""
+v.1.0.0 - Basic release
+Profiling of the optimization stages with cProfile and tracemalloc. Running this module prints
+the summary of a profiling directory:
+
+    python profiling.py <output_directory> [number of lines]
+"""
+
+import os
+import sys
+import glob
+import time
+import pstats
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+
+
+class StageProfiler:
+    """Collects one cProfile per stage and tracemalloc snapshots every N iterations"""
+
+    def __init__(self, output_directory: str, snapshot_interval: int = 50) -> None:
+        """
+        Initialization of local class variables and start of tracemalloc
+
+        Args:
+            output_directory (str): directory where the statistics and snapshots are saved
+            snapshot_interval (int): number of iterations between saves
+        """
+        self.output_directory = output_directory
+        self.snapshot_interval = snapshot_interval
+        self.profiles = {}
+        self.stage_times = {}
+        self.previous_snapshot = None
+
+        os.makedirs(output_directory, exist_ok=True)
+
+        self.started_tracemalloc = not tracemalloc.is_tracing()
+        if self.started_tracemalloc:
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Profiles the code executed inside the with block as part of the given stage
+
+        Args:
+            name (str): stage name, e.g. "write", "solve", "parse", "criteria", "ask", "tell"
+        """
+        profile = self.profiles.setdefault(name, cProfile.Profile())
+        start_time = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self.stage_times[name] = self.stage_times.get(name, 0.0) + \
+                time.perf_counter() - start_time
+
+    def end_iteration(self, iteration: int) -> None:
+        """
+        Saves the statistics every snapshot_interval iterations
+
+        Args:
+            iteration (int): index of the iteration that ended
+        """
+        if (iteration + 1) % self.snapshot_interval == 0:
+            self.save(iteration + 1)
+
+    def save(self, iteration: int) -> None:
+        """
+        Saves the profile statistics of each stage and a memory snapshot. The growth since the
+        previous snapshot is appended to memory_growth.txt.
+
+        Args:
+            iteration (int): number of iterations done, used in the snapshot name
+        """
+        for name, profile in self.profiles.items():
+            profile.dump_stats(os.path.join(self.output_directory, f"{name}.prof"))
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")))
+        snapshot.dump(os.path.join(self.output_directory, f"memory_{iteration:06d}.snapshot"))
+
+        with open(os.path.join(self.output_directory, "memory_growth.txt"), 'a',
+                  encoding="utf-8") as file:
+            file.write(f"Iteration {iteration}\n")
+            for name, stage_time in self.stage_times.items():
+                file.write(f"  {name}: {stage_time:.4f} seconds\n")
+            if self.previous_snapshot is not None:
+                for statistic in snapshot.compare_to(self.previous_snapshot, "lineno")[:10]:
+                    file.write(f"  {statistic}\n")
+            file.write("\n")
+
+        self.previous_snapshot = snapshot
+
+    def stop(self, iteration: int) -> None:
+        """
+        Saves the final statistics and stops tracemalloc if it was started by the profiler
+
+        Args:
+            iteration (int): number of iterations done
+        """
+        if iteration % self.snapshot_interval != 0:
+            self.save(iteration)
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+
+
+def print_summary(output_directory: str, num_lines: int = 15) -> None:
+    """
+    Prints the hot spots of each stage and the memory growth between the first and the last
+    snapshot of a profiling directory.
+
+    Args:
+        output_directory (str): directory given to the StageProfiler
+        num_lines (int): number of functions and allocation sites printed
+    """
+    profile_files = sorted(glob.glob(os.path.join(output_directory, "*.prof")))
+    if not profile_files:
+        print(f"No profile statistics found in {output_directory}")
+        return
+
+    # Total time of each stage, slower stages first
+    stage_stats = [(os.path.basename(path)[:-5], pstats.Stats(path)) for path in profile_files]
+    stage_stats.sort(key=lambda item: item[1].total_tt, reverse=True)
+
+    print("********** STAGE TIMES **********")
+    for name, stats in stage_stats:
+        print(f"{name}: {stats.total_tt:.4f} seconds")
+
+    for name, stats in stage_stats:
+        print(f"\n********** HOT SPOTS - {name.upper()} **********")
+        stats.sort_stats("tottime").print_stats(num_lines)
+
+    snapshot_files = sorted(glob.glob(os.path.join(output_directory, "memory_*.snapshot")))
+    if len(snapshot_files) < 2:
+        return
+
+    first = tracemalloc.Snapshot.load(snapshot_files[0])
+    last = tracemalloc.Snapshot.load(snapshot_files[-1])
+    print(f"\n********** MEMORY GROWTH - {os.path.basename(snapshot_files[0])} TO "
+          f"{os.path.basename(snapshot_files[-1])} **********")
+    for statistic in last.compare_to(first, "lineno")[:num_lines]:
+        print(statistic)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python profiling.py <output_directory> [number of lines]")
+    else:
+        print_summary(sys.argv[1], *[int(arg) for arg in sys.argv[2:3]])
@@ -2,8 +2,81 @@
 v.1.0.0 - Basic release
 Comprises user interaction interface to retrieve optimization parameters
 """
+import os
+import re
+import fnmatch
+import threading
 from file_manager import FileProcessor
 
+# Selection of a range of entries, e.g. "10-500"
+RANGE_PATTERN = re.compile(r"\s*(\d+)\s*-\s*(\d+)\s*")
+
+
+class ListingIndex:
+    """Paged view of a list of deck entries, filtered by substring or glob pattern"""
+
+    page_size = 20
+
+    def __init__(self, entries: list) -> None:
+        """
+        Initialization of the upper case keys used by the filters
+
+        Args:
+            entries (list): entries shown to the user, such as the sets or orientations list
+        """
+        self.entries = entries
+        self.keys = [entry.upper() for entry in entries]
+        self.pattern = ""
+        self.matches = list(range(len(entries)))
+        self.page = 0
+
+    def set_filter(self, pattern: str) -> None:
+        """
+        Keeps only the entries that contain the pattern, or that match it if it has glob
+        characters (* ? [). A pattern that extends the previous substring only searches the
+        previous matches.
+
+        Args:
+            pattern (str): text or glob pattern, an empty pattern shows all the entries
+        """
+        pattern = pattern.strip().upper()
+        is_glob = any(character in pattern for character in "*?[")
+        previous_is_glob = any(character in self.pattern for character in "*?[")
+
+        if pattern and not is_glob and not previous_is_glob and self.pattern in pattern:
+            candidates = self.matches
+        else:
+            candidates = range(len(self.entries))
+
+        if not pattern:
+            self.matches = list(candidates)
+        elif is_glob:
+            self.matches = [i for i in candidates if fnmatch.fnmatchcase(self.keys[i], pattern)]
+        else:
+            self.matches = [i for i in candidates if pattern in self.keys[i]]
+
+        self.pattern = pattern
+        self.page = 0
+
+    def num_pages(self) -> int:
+        """Number of pages of the filtered entries"""
+        return max(1, -(-len(self.matches) // self.page_size))
+
+    def move(self, pages: int) -> None:
+        """
+        Changes the current page
+
+        Args:
+            pages (int): number of pages to move, negative values go back
+        """
+        self.page = min(max(self.page + pages, 0), self.num_pages() - 1)
+
+    def page_indices(self) -> list:
+        """Indexes of the entries of the current page"""
+        start = self.page * self.page_size
+        return self.matches[start:start + self.page_size]
+
+
 class UserInterfaceCMD:
     """Main user interaction module"""
 
@@ -16,6 +89,10 @@ class UserInterfaceCMD:
         self.elset_choosen = ''
         self.orient_choosen = []
         self.orient_type = []
+        self.file_path = None
+        self.loader = None
+        self.loader_error = None
+        self.listings = None
         self.input_handler = {
             "0": None,
             "1": self.material_input_processing,
@@ -31,19 +108,25 @@ class UserInterfaceCMD:
 
     def material_input_processing(self) -> None:
         """User interaction to define material selection"""
+        self._wait_for_deck()
+        listing = self.listings["materials"]
+
         while True:
             print("\n********** MATERIAL DEFINITION **********")
             print("The materials are:")
 
-            for index, material in enumerate(self.file_processor.materials_list):
-                print(f"{index} - {material}")
+            self._print_listing(listing, lambda index, material: f"{index} - {material}")
 
             print("NEXT - All materials set")
             print("CLEAR - clear current selection")
             print("ALL - Select all materials at once")
+            print("START-END - Select a range of materials, e.g. 10-500")
             material_input = input(
                 "\nPlease select which materials will be included in the optimization: ")
 
+            if self._listing_command(listing, material_input):
+                continue
+
             if material_input.upper() == "NEXT":
                 print(f"\nSelected materials = {self.materials_choosen}")
                 break
@@ -52,6 +135,10 @@ class UserInterfaceCMD:
                 self.materials_choosen = []
                 print("\nList of materials has been cleared")
 
+            elif RANGE_PATTERN.fullmatch(material_input):
+                added = self._select_range(material_input, self.materials_choosen, listing)
+                print(f"\n{len(added)} materials added to the selection")
+
             elif material_input.upper() == "ALL":
                 for i in range(len(self.file_processor.materials_list)):
                     self.materials_choosen.append(i)
@@ -72,6 +159,8 @@ class UserInterfaceCMD:
 
     def step_input_processing(self) -> None:
         """User interaction to define step selection"""
+        self._wait_for_deck()
+
         while True:
             print("\n********** STEP DEFINITION **********")
             print("The steps are:")
@@ -93,18 +182,23 @@ class UserInterfaceCMD:
 
     def node_sets_processing(self) -> None:
         """User interaction to define node set selection"""
+        self._wait_for_deck()
+        listing = self.listings["nsets"]
+
         while True:
             print("\n********** NODE SETS DEFINITION **********")
             print("The available node sets are:")
 
-            for index, nset in enumerate(self.file_processor.nsets_list):
-                print(f"{index} - {nset}")
+            self._print_listing(listing, lambda index, nset: f"{index} - {nset}")
 
             print("NEXT - Node set selected")
             print("CLEAR - clear current selection")
             nset_input = input(
                 "\nPlease select which node set will be included in the optimization: ")
 
+            if self._listing_command(listing, nset_input):
+                continue
+
             if nset_input.upper() == "NEXT":
                 print(f"\nSelected node set = {self.nset_choosen}")
                 break
@@ -126,18 +220,23 @@ class UserInterfaceCMD:
 
     def element_sets_processing(self) -> None:
         """User interaction to define element set selection"""
+        self._wait_for_deck()
+        listing = self.listings["elsets"]
+
         while True:
             print("\n********** ELEMENT SETS DEFINITION **********")
             print("The available element sets are:")
 
-            for index, elset in enumerate(self.file_processor.elsets_list):
-                print(f"{index} - {elset}")
+            self._print_listing(listing, lambda index, elset: f"{index} - {elset}")
 
             print("NEXT - element set selected")
             print("CLEAR - clear current selection")
             elset_input = input(
                 "\nPlease select which element set will be included in the optimization: ")
 
+            if self._listing_command(listing, elset_input):
+                continue
+
             if elset_input.upper() == "NEXT":
                 print(f"\nSelected element set = {self.elset_choosen}")
                 break
@@ -159,6 +258,8 @@ class UserInterfaceCMD:
 
     def orientation_processing(self) -> None:
         """User interaction to define orientation selection and type (discrete/continuous)"""
+        self._wait_for_deck()
+        listing = self.listings["orientations"]
 
         # Initialize all orientations as continuous
         self.orient_type = ['CONTINUOUS'] * len(self.file_processor.orientations_list)
@@ -167,15 +268,20 @@ class UserInterfaceCMD:
             print("\n********** ORIENTATIONS DEFINITION **********")
             print("The available orientation cards are:")
 
-            for index, orientation in enumerate(self.file_processor.orientations_list):
-                print(f"{index} - [{self.orient_type[index]}] - {orientation}")
+            self._print_listing(
+                listing,
+                lambda index, orientation: f"{index} - [{self.orient_type[index]}] - {orientation}")
 
             print("NEXT - orientations selected")
             print("CLEAR - clear current selection")
             print("ALL - Include all orientations at once")
+            print("START-END - Include a range of orientations, e.g. 10-500")
             orientation_input = input(
                 "\nPlease select an orientation to modify its parameters: ")
 
+            if self._listing_command(listing, orientation_input):
+                continue
+
             if orientation_input.upper() == "NEXT":
                 print(f"\nSelected orientations = {self.orient_choosen}")
                 break
@@ -184,6 +290,16 @@ class UserInterfaceCMD:
                 self.orient_choosen = []
                 print("\nList of orientations to be included has been cleared")
 
+            elif RANGE_PATTERN.fullmatch(orientation_input):
+                added = self._select_range(orientation_input, self.orient_choosen, listing)
+                type_answer = input("Which is the TYPE of these cards? [CONTINUOUS/DISCRETE]")
+                if type_answer.upper() == 'DISCRETE' or type_answer.upper() == 'CONTINUOUS':
+                    for index in added:
+                        self.orient_type[index] = type_answer.upper()
+                else:
+                    print("Invalid entry, the cards keep their current type.")
+                print(f"\n{len(added)} orientations added to the selection")
+
             elif orientation_input.upper() == "ALL":
                 self.orient_choosen = []
                 for i in range(len(self.file_processor.orientations_list)):
@@ -217,6 +333,71 @@ class UserInterfaceCMD:
             else:
                 print("Invalid selection.")
 
+    def _print_listing(self, listing: ListingIndex, formatter) -> None:
+        """
+        Prints the current page of a listing with the navigation commands
+
+        Args:
+            listing (ListingIndex): listing to be printed
+            formatter (callable): receives the index and the entry and returns the printed line
+        """
+        for index in listing.page_indices():
+            print(formatter(index, listing.entries[index]))
+
+        if listing.pattern:
+            print(f"Filter: {listing.pattern} ({len(listing.matches)} of "
+                  f"{len(listing.entries)} entries)")
+        if listing.pattern or listing.num_pages() > 1:
+            print(f"Page {listing.page + 1} of {listing.num_pages()}")
+            print("> / < - Next / previous page")
+        print("FIND <text> - Filter by text or glob pattern (e.g. *SKIN*), FIND alone clears it")
+
+    def _listing_command(self, listing: ListingIndex, user_input: str) -> bool:
+        """
+        Handles the page and filter commands of a listing
+
+        Args:
+            listing (ListingIndex): listing shown to the user
+            user_input (str): user entry
+
+        Returns:
+            handled (bool): True if the entry was a listing command
+        """
+        command = user_input.strip()
+        if command == ">":
+            listing.move(1)
+        elif command == "<":
+            listing.move(-1)
+        elif command.upper() == "FIND" or command.upper().startswith("FIND "):
+            listing.set_filter(command[4:])
+        else:
+            return False
+        return True
+
+    def _select_range(self, user_input: str, selection: list, listing: ListingIndex) -> list:
+        """
+        Appends a range of indexes to a selection. When a filter is active, only the filtered
+        entries inside the range are selected.
+
+        Args:
+            user_input (str): range in the format START-END
+            selection (list): selected indexes, changed in place
+            listing (ListingIndex): listing of the selected entries
+
+        Returns:
+            added (list): indexes added to the selection
+        """
+        match = RANGE_PATTERN.fullmatch(user_input)
+        start, end = sorted((int(match.group(1)), int(match.group(2))))
+        end = min(end, len(listing.entries) - 1)
+
+        candidates = set(listing.matches) if listing.pattern else None
+        already_selected = set(selection)
+        added = [index for index in range(start, end + 1)
+                 if index not in already_selected and (candidates is None or index in candidates)]
+        selection.extend(added)
+        return added
+
     def shell_processing(self) -> None:
         pass
 
@@ -232,18 +413,56 @@ class UserInterfaceCMD:
     def dialog_file_input(self) -> None:
         """Initialization of user interaction to read the file path"""
         print(f"Welcome to optComp {self.optcomp_version}")
+        self._request_file_path()
 
-        # Input file processing
+    def _request_file_path(self) -> None:
+        """
+        Asks the input file path and loads it in background, so that the menu is shown while
+        the deck is read.
+        """
         while True:
             file_path = input("Please paste the path to your CalculiX input file (*.inp): ")
-            try:
-                self.file_processor.read_file(file_path)
-                self.file_processor.search_information()
-            except TypeError:
-                print("The file couldn't be loaded. Check its path, spelling and presence of *.inp")
-            else:
+            if os.path.isfile(file_path):
+                break
+            print("The file couldn't be loaded. Check its path, spelling and presence of *.inp")
+
+        self.file_path = file_path
+        self.loader_error = None
+        self.listings = None
+        self.loader = threading.Thread(target=self._load_deck, daemon=True)
+        self.loader.start()
+
+    def _load_deck(self) -> None:
+        """
+        Reads the input file and its metadata, executed by the loader thread. Any error is kept,
+        so the menus are not built from a partly read deck.
+        """
+        try:
+            self.file_processor.open_deck(self.file_path)
+        except Exception as error:
+            self.loader_error = error
+
+    def _wait_for_deck(self) -> None:
+        """Waits for the background loading and builds the listings used by the menus"""
+        while True:
+            if self.loader.is_alive():
+                print("\nLoading the input file, please wait...")
+                self.loader.join()
+
+            if self.loader_error is None:
                 break
 
+            print(f"The file couldn't be loaded: {self.loader_error}")
+            self._request_file_path()
+
+        if self.listings is None:
+            self.listings = {
+                "materials": ListingIndex(self.file_processor.materials_list),
+                "nsets": ListingIndex(self.file_processor.nsets_list),
+                "elsets": ListingIndex(self.file_processor.elsets_list),
+                "orientations": ListingIndex(self.file_processor.orientations_list)
+            }
+
     def dialog_analysis_parameters(self) -> None:
         """Dialog of GUI to adjust analysis parameters"""
         while True: